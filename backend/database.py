@@ -1,15 +1,65 @@
 import os
-from supabase import create_client, Client
+import asyncio
+import httpx
+import orjson
+from supabase import create_client, create_async_client, Client, AsyncClient
+from supabase.lib.client_options import AsyncClientOptions
 from typing import Dict, List, Optional
 import uuid
 from datetime import datetime, timedelta
 import time
+from collections import OrderedDict
 
 # Initialize Supabase client
 supabase_url = os.getenv("SUPABASE_URL")
 supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")  # Use service role for server-side operations
 supabase: Client = create_client(supabase_url, supabase_key)
 
+class OrjsonAsyncClient(httpx.AsyncClient):
+    """
+    httpx client that serializes JSON request bodies with orjson instead of stdlib json
+    """
+    def build_request(self, method, url, *, content=None, json=None, headers=None, **kwargs):
+        if json is not None and content is None:
+            content = orjson.dumps(json)
+            headers = httpx.Headers(headers)
+            headers["Content-Type"] = "application/json"
+            json = None
+        return super().build_request(method, url, content=content, json=json, headers=headers, **kwargs)
+
+# Async client for request handlers - created once on startup (see main.lifespan)
+_async_supabase: Optional[AsyncClient] = None
+_async_http_client: Optional[OrjsonAsyncClient] = None
+
+async def get_async_supabase() -> AsyncClient:
+    """
+    Return the shared async Supabase client, creating it on first use
+    """
+    global _async_supabase, _async_http_client
+    if _async_supabase is None:
+        # One pooled HTTP/2 connection set shared by every handler, so TLS setup is paid once
+        _async_http_client = OrjsonAsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=100),
+            timeout=httpx.Timeout(10.0, connect=2.0)
+        )
+        _async_supabase = await create_async_client(
+            supabase_url,
+            supabase_key,
+            options=AsyncClientOptions(httpx_client=_async_http_client)
+        )
+    return _async_supabase
+
+async def close_async_supabase() -> None:
+    """
+    Close the pooled HTTP connections behind the async Supabase client
+    """
+    global _async_supabase, _async_http_client
+    if _async_http_client is not None:
+        await _async_http_client.aclose()
+    _async_supabase = None
+    _async_http_client = None
+
 # ROLE-BASED AUTHORIZATION FUNCTIONS
 
 async def get_user_profile_by_id(user_id: str) -> Optional[Dict]:
@@ -130,8 +180,44 @@ async def save_outcome_titles(report_id: str, titles: List[str]) -> bool:
     ]
     
     result = supabase.table("pov_outcome_titles").insert(title_data).execute()
+    
+    # Titles are part of the materialized context block, so rebuild it now
+    try:
+        await refresh_pov_context_md(report_id, titles)
+    except Exception as e:
+        print(f"⚠️ Failed to refresh POV context block for {report_id}: {e}")
+    
+    invalidate_pov_report_cache(report_id)
     return len(result.data) == len(titles)
 
+def build_pov_context_md(report: Dict, titles: List[str]) -> str:
+    """
+    Canonical markdown context block for a POV report, shared by the artifact prompts
+    """
+    lines = [
+        f"- Vendor: {report.get('vendor_name') or ''}",
+        f"- Services: {report.get('vendor_services') or ''}",
+        f"- Customer: {report.get('target_customer_name') or ''}",
+        f"- Roles: {report.get('role_names') or ''}",
+        "- POV Titles:",
+    ]
+    lines.extend(f"- {title}" for title in titles)
+    return "\n".join(lines)
+
+async def refresh_pov_context_md(report_id: str, titles: List[str]) -> str:
+    """
+    Rebuild and store the materialized context block for a report
+    """
+    db = await get_async_supabase()
+    report_result = await db.table("pov_reports").select("vendor_name, vendor_services, target_customer_name, role_names").eq("id", report_id).execute()
+    if not report_result.data:
+        raise Exception("Report not found")
+    
+    pov_context_md = build_pov_context_md(report_result.data[0], titles)
+    await db.table("pov_reports").update({"pov_context_md": pov_context_md}).eq("id", report_id).execute()
+    invalidate_pov_report_cache(report_id)
+    return pov_context_md
+
 async def save_outcome_details(report_id: str, outcomes: List[str]) -> bool:
     """
     Save the detailed outcome analysis to the database
@@ -147,6 +233,7 @@ async def save_outcome_details(report_id: str, outcomes: List[str]) -> bool:
     ]
     
     result = supabase.table("pov_outcomes").insert(outcome_data).execute()
+    invalidate_pov_report_cache(report_id)
     return len(result.data) == len(outcomes)
 
 async def save_summary_and_takeaways(report_id: str, summary_content: str) -> bool:
@@ -174,6 +261,7 @@ async def save_summary_and_takeaways(report_id: str, summary_content: str) -> bo
     }
     
     result = supabase.table("pov_summary").insert(summary_data).execute()
+    invalidate_pov_report_cache(report_id)
     return len(result.data) > 0
 
 async def update_report_status(report_id: str, status: str) -> bool:
@@ -181,38 +269,93 @@ async def update_report_status(report_id: str, status: str) -> bool:
     Update the status of a POV report
     """
     result = supabase.table("pov_reports").update({"status": status, "updated_at": datetime.now().isoformat()}).eq("id", report_id).execute()
+    invalidate_pov_report_cache(report_id)
     return len(result.data) > 0
 
+# Short-lived cache of get_pov_report_data() results. Keyed on (report_id, user_id)
+# so a cached payload is only ever returned to the user it was loaded for.
+# The cache and its invalidation are per-process, so it is only enabled when running a
+# single worker - with more, other workers would serve stale reports until the TTL expires.
+POV_REPORT_CACHE_ENABLED = int(os.getenv("WORKERS", "1")) <= 1
+POV_REPORT_CACHE_TTL_SECONDS = 60
+POV_REPORT_CACHE_MAX_ENTRIES = 1024
+_pov_report_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_pov_report_locks: Dict[tuple, asyncio.Lock] = {}
+
+def invalidate_pov_report_cache(report_id: str) -> None:
+    """
+    Drop cached report data for a report (all users) after it changes
+    """
+    for key in [key for key in _pov_report_cache if key[0] == report_id]:
+        del _pov_report_cache[key]
+
+def _cached_pov_report_data(key: tuple) -> Optional[Dict]:
+    entry = _pov_report_cache.get(key)
+    if entry is None:
+        return None
+    if entry[0] <= time.monotonic():
+        del _pov_report_cache[key]
+        return None
+    _pov_report_cache.move_to_end(key)
+    return entry[1]
+
 async def get_pov_report_data(report_id: str, user_id: str) -> Dict:
     """
-    Retrieve all POV report data for a given report ID and user ID
+    Retrieve all POV report data for a given report ID and user ID.
+    Results are cached for POV_REPORT_CACHE_TTL_SECONDS when running a single worker;
+    callers must treat them as read-only.
     """
-    # Get report details
-    report_result = supabase.table("pov_reports").select("*").eq("id", report_id).eq("user_id", user_id).execute()
+    if not POV_REPORT_CACHE_ENABLED:
+        return await _fetch_pov_report_data(report_id, user_id)
     
-    if not report_result.data:
-        raise Exception("Report not found or access denied")
-    
-    report = report_result.data[0]
+    key = (report_id, user_id)
+    cached = _cached_pov_report_data(key)
+    if cached is not None:
+        return cached
     
-    # Get outcome titles
-    titles_result = supabase.table("pov_outcome_titles").select("*").eq("report_id", report_id).order("title_index").execute()
+    # One loader per key - concurrent requests for the same report wait for it instead of refetching
+    lock = _pov_report_locks.setdefault(key, asyncio.Lock())
+    async with lock:
+        cached = _cached_pov_report_data(key)
+        if cached is not None:
+            return cached
+        try:
+            data = await _fetch_pov_report_data(report_id, user_id)
+        finally:
+            _pov_report_locks.pop(key, None)
+        
+        _pov_report_cache[key] = (time.monotonic() + POV_REPORT_CACHE_TTL_SECONDS, data)
+        _pov_report_cache.move_to_end(key)
+        while len(_pov_report_cache) > POV_REPORT_CACHE_MAX_ENTRIES:
+            _pov_report_cache.popitem(last=False)
+        return data
+
+async def _fetch_pov_report_data(report_id: str, user_id: str) -> Dict:
+    db = await get_async_supabase()
     
-    # Get outcome details
-    outcomes_result = supabase.table("pov_outcomes").select("*").eq("report_id", report_id).order("outcome_index").execute()
+    # Report, titles, outcomes, summary and Grok research are independent - fetch concurrently
+    report_result, titles_result, outcomes_result, summary_result, grok_research = await asyncio.gather(
+        db.table("pov_reports").select("*").eq("id", report_id).eq("user_id", user_id).execute(),
+        db.table("pov_outcome_titles").select("*").eq("report_id", report_id).order("title_index").execute(),
+        db.table("pov_outcomes").select("*").eq("report_id", report_id).order("outcome_index").execute(),
+        db.table("pov_summary").select("*").eq("report_id", report_id).execute(),
+        get_grok_research_by_report(report_id, user_id)
+    )
     
-    # Get summary
-    summary_result = supabase.table("pov_summary").select("*").eq("report_id", report_id).execute()
+    if not report_result.data:
+        raise Exception("Report not found or access denied")
     
-    # Get Grok research if available
-    grok_research = await get_grok_research_by_report(report_id, user_id)
+    report = report_result.data[0]
+    titles = [item["title"] for item in titles_result.data]
     
     return {
         "report": report,
-        "titles": [item["title"] for item in titles_result.data],
+        "titles": titles,
         "outcomes": [item["content"] for item in outcomes_result.data],
         "summary": summary_result.data[0] if summary_result.data else None,
-        "grok_research": grok_research
+        "grok_research": grok_research,
+        # Reports created before the column existed fall back to building it on the fly
+        "pov_context_md": report.get("pov_context_md") or build_pov_context_md(report, titles)
     }
 
 async def get_pov_report_data_with_auth(report_id: str, requesting_user_id: str) -> Dict:
@@ -331,6 +474,7 @@ async def update_selected_titles(report_id: str, user_id: str, selected_indices:
         for index in selected_indices:
             supabase.table("pov_outcome_titles").update({"selected": True}).eq("report_id", report_id).eq("title_index", index).execute()
     
+    invalidate_pov_report_cache(report_id)
     return True
 
 async def get_selected_titles(report_id: str, user_id: str) -> List[Dict]:
@@ -367,6 +511,7 @@ async def save_selected_outcome_details(report_id: str, outcomes_data: List[Dict
     ]
     
     result = supabase.table("pov_outcomes").insert(outcome_data).execute()
+    invalidate_pov_report_cache(report_id)
     return len(result.data) == len(outcomes_data)
 
 async def get_report_titles_only(report_id: str, user_id: str) -> Dict:
@@ -394,6 +539,7 @@ async def save_context_data(report_id: str, context_data: Dict) -> bool:
     Save the gathered context data to avoid re-gathering in step 2
     """
     result = supabase.table("pov_reports").update({"context_data": context_data}).eq("id", report_id).execute()
+    invalidate_pov_report_cache(report_id)
     return len(result.data) > 0
 
 async def get_context_data(report_id: str, user_id: str) -> Dict:
@@ -1831,6 +1977,7 @@ async def create_grok_research(
             })
         
         result = supabase.table("grok_research").insert(research_data).execute()
+        invalidate_pov_report_cache(report_id)
         
         if result.data:
             print(f"✅ Grok research saved for report {report_id}")
@@ -1847,7 +1994,8 @@ async def get_grok_research_by_report(report_id: str, user_id: str) -> Optional[
     Get Grok research data for a specific report
     """
     try:
-        result = supabase.table("grok_research").select("*").eq("report_id", report_id).eq("user_id", user_id).single().execute()
+        db = await get_async_supabase()
+        result = await db.table("grok_research").select("*").eq("report_id", report_id).eq("user_id", user_id).single().execute()
         return result.data if result.data else None
     except Exception as e:
         print(f"❌ Error getting Grok research: {str(e)}")
@@ -1859,6 +2007,7 @@ async def update_grok_research_status(report_id: str, user_id: str, status: str)
     """
     try:
         result = supabase.table("grok_research").update({"research_status": status}).eq("report_id", report_id).eq("user_id", user_id).execute()
+        invalidate_pov_report_cache(report_id)
         return bool(result.data)
     except Exception as e:
         print(f"❌ Error updating Grok research status: {str(e)}")
@@ -1,14 +1,17 @@
 import os
-import requests
-import json
-import time
 # from llm_functions import *
-import threading
 import asyncio
 import re
+from typing import Optional
+import httpx
 
 api_key = os.environ['PROXYCURL_API']
 
+PROXYCURL_ENDPOINT = 'https://nubela.co/proxycurl/api/v2/linkedin'
+
+# Pooled connections to Proxycurl shared by every request, so TLS setup is paid once per connection
+_http_client: Optional[httpx.AsyncClient] = None
+
 def preprocess_text(text):
     """Preprocess the input text by adding a space before each 'https:' to ensure URLs are separated."""
     return text.replace("https:", " https:").strip()
@@ -93,66 +96,63 @@ def format_profile(profile):
     return "\n".join(output)
 
 
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the shared Proxycurl HTTP client, creating it on first use
+    """
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+            timeout=httpx.Timeout(60.0, connect=5.0)
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """
+    Close the pooled Proxycurl connections
+    """
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+    _http_client = None
+
+
 async def fetch_social_media_profile_async(profile_url, api_key):
-    headers = {'Authorization': 'Bearer ' + api_key}
-    api_endpoint = 'https://nubela.co/proxycurl/api/v2/linkedin'
+    if 'linkedin.com' not in profile_url:
+        return {"error": "Unsupported URL. Please provide a LinkedIn URL."}
+
     params = {
         'extra': 'include',
         'use_cache': 'if-recent',
         'fallback_to_cache': 'on-error',
+        'linkedin_profile_url': profile_url,
     }
-
-    if 'linkedin.com' in profile_url:
-        params['linkedin_profile_url'] = profile_url
-    else:
-        return {"error": "Unsupported URL. Please provide a LinkedIn URL."}
-
     try:
-        response = requests.get(api_endpoint, params=params, headers=headers)
+        response = await get_http_client().get(
+            PROXYCURL_ENDPOINT, params=params, headers={'Authorization': 'Bearer ' + api_key}
+        )
         response.raise_for_status()
         return response.json()
-    except requests.RequestException as e:
+    except (httpx.HTTPError, ValueError) as e:
         return {"error": str(e)}
 
 
-def run_async_in_thread(fn, args, shared_dict, key):
-    def start_loop(loop):
-        try:
-            asyncio.set_event_loop(loop)
-            result = loop.run_until_complete(fn(*args))
-            shared_dict[key] = result
-        except Exception as e:
-            shared_dict[key] = {"error": f"Error occurred: {e}"}
-
-    loop = asyncio.new_event_loop()
-    thread = threading.Thread(target=start_loop, args=(loop,))
-    thread.start()
-    return thread
-
-
-def fetch_profiles_in_threads(li_input_text):
-    api_key = os.environ['PROXYCURL_API']
-
-    # Preprocess and extract URLs
+async def fetch_profiles_async(li_input_text):
+    """
+    Fetch every profile concurrently on the event loop over pooled connections.
+    Profiles that fail to load are logged and left out rather than failing the whole batch.
+    """
     linkedin_urls = extract_and_preprocess_linkedin_urls(li_input_text)
-    
-    # results = {}
-    results = []
-    threads = []
-
-    for url in linkedin_urls:
-        shared_dict = {}  # Create a separate dictionary for each thread
-        thread = run_async_in_thread(fetch_social_media_profile_async, (url, api_key), shared_dict, url)
-        threads.append((url, thread, shared_dict))
-
-    # Wait for all threads to finish
-    for url, thread, shared_dict in threads:
-        thread.join()
-        # results[url] = shared_dict[url]  # Fetch the result from the corresponding dictionary
-        results.append(shared_dict[url])
-
-    formatted_results = [format_profile(profile) for profile in results]
-
-    profiles_text = "\n\n---\n\n".join(formatted_results)
-
-    return profiles_text
\ No newline at end of file
+    results = await asyncio.gather(
+        *[fetch_social_media_profile_async(url, api_key) for url in linkedin_urls],
+        return_exceptions=True
+    )
+    formatted_results = []
+    for url, profile in zip(linkedin_urls, results):
+        if isinstance(profile, BaseException) or 'error' in profile:
+            print(f"Skipping LinkedIn profile {url}: {profile['error'] if isinstance(profile, dict) else profile}")
+            continue
+        formatted_results.append(format_profile(profile))
+    return "\n\n---\n\n".join(formatted_results)
@@ -6,6 +6,9 @@ import time
 import os
 import json
 import threading
+from functools import lru_cache
+from typing import List
+import tiktoken
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -16,14 +19,51 @@ openai_key = os.getenv('OPENAI_API_KEY')
 client = OpenAI(api_key=openai_key)
 client_async = AsyncOpenAI(api_key=openai_key, max_retries=1, timeout=300)
 
-def call_gpt(prompt, system_prompt="", model='gpt-4.1-mini', format='text', temp=0.0):
+@lru_cache(maxsize=1)
+def _token_encoding():
+    # Tokenizer used by the gpt-4o / gpt-4.1 model family; None when it can't be loaded (e.g. no network to fetch the BPE file)
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        print(f"⚠️ Tokenizer unavailable, estimating token counts from length: {e}")
+        return None
+
+def warm_token_encoding():
+    """
+    Load the tokenizer ahead of the first count_tokens() call, which would otherwise download the BPE file
+    """
+    _token_encoding()
+
+def count_tokens(text):
+    """
+    Number of tokens text takes up in a prompt (roughly 4 characters per token if the tokenizer is unavailable)
+    """
+    encoding = _token_encoding()
+    if encoding is None:
+        return len(text) // 4
+    return len(encoding.encode(text))
+
+def build_user_content(prompt, cached_prefix=None):
+    """
+    User message content with an optional static prefix as its own leading block.
+    Keeping static text first (and byte-identical across calls) lets the provider's
+    automatic prefix caching reuse it.
+    """
+    if not cached_prefix:
+        return prompt
+    return [
+        {"type": "text", "text": cached_prefix},
+        {"type": "text", "text": prompt}
+    ]
+
+def call_gpt(prompt, system_prompt="", model='gpt-4.1-mini', format='text', temp=0.0, cached_prefix=None):
     start_time = time.time()
     completion = client.chat.completions.create(
         model=model,
         response_format={"type": format},
         messages=[
             {"role": "system", "content": system_prompt},
-            {"role": "user", "content": prompt}
+            {"role": "user", "content": build_user_content(prompt, cached_prefix)}
         ],
         temperature=temp,
     )
@@ -34,10 +74,48 @@ def call_gpt(prompt, system_prompt="", model='gpt-4.1-mini', format='text', temp
     print(f"Time taken: {elapsed_time} seconds")
     return completion.choices[0].message.content, completion
 
+async def acall_gpt(prompt, system_prompt="", model='gpt-4.1-mini', format='text', temp=0.0, cached_prefix=None):
+    """
+    call_gpt() on the async client, for use inside request handlers without blocking the event loop
+    """
+    start_time = time.time()
+    completion = await client_async.chat.completions.create(
+        model=model,
+        response_format={"type": format},
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": build_user_content(prompt, cached_prefix)}
+        ],
+        temperature=temp,
+    )
+    print(f"Time taken: {time.time() - start_time} seconds")
+    return completion.choices[0].message.content, completion
+
+async def call_gpt_stream(prompt, system_prompt="", model='gpt-4.1-mini', temp=0.0, cached_prefix=None):
+    """
+    Stream a chat completion, yielding content deltas as they arrive
+    """
+    start_time = time.time()
+    stream = await client_async.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": build_user_content(prompt, cached_prefix)}
+        ],
+        temperature=temp,
+        stream=True,
+    )
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+    print(f"Time taken (stream): {time.time() - start_time} seconds")
+
 async def llm_call(instructions,
                    system_prompt="",
                    model='gpt-4.1-mini',
-                   response_format='text'):
+                   response_format='text',
+                   max_completion_tokens=4000):
     start_time = time.time()
     print(f"Is this where it gets iffy (async llm_call):{model}")
     tasks = [
@@ -52,7 +130,7 @@ async def llm_call(instructions,
                 "content": instruction
             }],
             temperature=0.0,
-            max_completion_tokens=4000) for instruction in instructions
+            max_completion_tokens=max_completion_tokens) for instruction in instructions
     ]
 
     # Using asyncio.gather to maintain order
@@ -137,18 +215,24 @@ async def llm_01_async(instructions, model='o1-mini'):
 # New Prompt Functions for Parallel POV Generation
 # --------------------------
 
+def with_background_context(background_context: str, *sections: str) -> str:
+    """
+    Prefix prompt sections with the shared background context block. Every titles/detail/summary
+    prompt for a report starts with exactly the same text so the provider's automatic prefix
+    caching can reuse the (large) background context across the parallel calls. The parts are
+    joined in one pass so the context is copied once per prompt.
+    """
+    return "".join(("**Background Context:**\n", background_context, "\n", *sections))
+
 def generate_outcome_titles_prompt(background_context: str, vendor_name: str, target_customer_name: str, role_names: str, num_outcomes: int = 15) -> str:
     """
     Generates a prompt to ask the LLM for a list of outcome titles.
     """
-    prompt = f"""
-Based on the following background context about {vendor_name} and {target_customer_name}, generate a list of exactly {num_outcomes} concise, impactful, and distinct outcome titles relevant to {target_customer_name}'s industry and the {role_names}.
+    instructions = f"""
+Based on the background context above about {vendor_name} and {target_customer_name}, generate a list of exactly {num_outcomes} concise, impactful, and distinct outcome titles relevant to {target_customer_name}'s industry and the {role_names}.
 
 These outcomes should represent key strategic goals, challenges, or transformations that {vendor_name}'s offerings can help {target_customer_name} achieve, specifically for the {role_names}.
 
-**Background Context:**
-{background_context}
-
 **Instructions:**
 1.  Analyze the provided context carefully, paying attention to the customer's industry, potential needs, and the vendor's capabilities.
 2.  Generate exactly {num_outcomes} unique and relevant outcome titles.
@@ -159,13 +243,47 @@ These outcomes should represent key strategic goals, challenges, or transformati
 **Output:**
 Return *only* the JSON list containing the {num_outcomes} outcome titles. Do not include any introductory text, explanations, or markdown formatting around the JSON list.
 """
-    return prompt
+    return with_background_context(background_context, instructions)
 
 def generate_single_outcome_detail_prompt(background_context: str, outcome_title: str, vendor_name: str, target_customer_name: str, role_names: str) -> str:
     """
     Generates a prompt to ask the LLM for the detailed analysis of a single outcome.
     Reuses the detailed structure and quality requirements from the original prompt.
     """
+    return with_background_context(
+        background_context, _outcome_detail_instructions(outcome_title, vendor_name, target_customer_name, role_names)
+    )
+
+def generate_batched_outcome_details_prompt(background_context: str, outcome_titles: List[str], vendor_name: str, target_customer_name: str, role_names: str) -> str:
+    """
+    Generates a prompt to ask the LLM for the detailed analyses of several outcomes in one call,
+    returned as a JSON object {"outcomes": [markdown, ...]} in title order.
+    """
+    titles_list = "\n".join(f"{i}. {title}" for i, title in enumerate(outcome_titles, 1))
+    header = f"""
+Write a separate detailed analysis for EACH of the following {len(outcome_titles)} outcomes, in this order:
+{titles_list}
+
+For every outcome, follow all of the instructions below, reading [OUTCOME TITLE] as that outcome's title. Each analysis must stand on its own and must not repeat examples used for the other outcomes.
+"""
+    output_format = f"""
+**Output:**
+Return *only* a JSON object of the form {{"outcomes": ["<markdown analysis of outcome 1>", "<markdown analysis of outcome 2>", ...]}} containing exactly {len(outcome_titles)} markdown strings, one per outcome above and in the same order.
+"""
+    return with_background_context(
+        background_context,
+        header,
+        _outcome_detail_instructions("[OUTCOME TITLE]", vendor_name, target_customer_name, role_names),
+        output_format
+    )
+
+@lru_cache(maxsize=256)
+def _outcome_detail_instructions(outcome_title: str, vendor_name: str, target_customer_name: str, role_names: str) -> str:
+    """
+    Role, quality requirements and output structure for one outcome's detailed analysis
+    (everything after the background context). Cached, since it doesn't depend on the context
+    and the same titles are re-rendered for batch fallbacks and regenerations.
+    """
     prompt = f"""
 You are a **world-class strategic advisor and master narrative consultant** from a top-tier firm, specializing in crafting deeply insightful and compelling Point-of-View (POV) analyses using the Jobs-to-be-Done framework. You write with **authority, precision, and a highly engaging, narrative style**. Your expertise includes **deep knowledge** of the industry and operational context relevant to **{target_customer_name}**, derived from the provided background information. You excel at **bringing abstract concepts to life with concrete, industry-relevant examples and vivid detail.** Your writing is not just informative but **deeply engaging and insightful**.
 
@@ -173,10 +291,7 @@ You are a **world-class strategic advisor and master narrative consultant** from
 
 Your task is to generate an **exceptionally insightful, deeply analytical, and highly persuasive YET CONCISE** detailed analysis for the *single* outcome titled: **"{outcome_title}"**. This analysis maps {vendor_name}'s capabilities to {target_customer_name}'s needs, specifically for the {role_names}. **This section must possess the depth, nuance, and strategic clarity expected of a premium consulting deliverable, delivered succinctly.**
 
-Use the following background context, **integrating it deeply and specifically throughout, PAYING PARTICULAR ATTENTION to the 'Customer Research' section to understand their specific industry and operations**:
-
-**Background Context:**
-{background_context}
+Use the background context above, **integrating it deeply and specifically throughout, PAYING PARTICULAR ATTENTION to the 'Customer Research' section to understand their specific industry and operations**.
 
 **CRITICAL REQUIREMENTS & VERY HIGH-QUALITY STANDARDS FOR THIS SINGLE, CONCISE OUTCOME:**
 1.  **DEEP CONTEXTUALIZATION (NON-NEGOTIABLE & CONCISE):** Weave in **specific examples** and terminology relevant to **{target_customer_name}'s specific industry and operational context**... **Show, don't just tell, but do so efficiently.**
@@ -230,15 +345,14 @@ def generate_summary_takeaways_prompt(background_context: str, vendor_name: str,
     """
     Generates a prompt to ask the LLM for only the final summary and takeaways sections.
     """
-    prompt = f"""
+    instructions = f"""
 You are a **world-class strategic advisor and master narrative consultant** from a top-tier firm.
 
 **CRITICAL LANGUAGE INSTRUCTION: Use clear, accessible English throughout. Avoid complex business jargon, overly sophisticated vocabulary, and academic language. Write in a way that is professional but easy to understand. Use simple, direct sentences and common words instead of complex terminology. The content should be insightful and analytical but expressed in plain English that any business professional can easily follow.**
 
-Based on the comprehensive analysis implicitly covered across {num_outcomes} distinct outcomes (which you should infer from the provided background context), generate **ONLY** the final "Summary & Strategic Integration" and "Key Takeaways & Next Steps" sections for a Point-of-View (POV) report mapping {vendor_name}'s capabilities to {target_customer_name}'s needs, specifically for the {role_names}.
+Based on the comprehensive analysis implicitly covered across {num_outcomes} distinct outcomes (which you should infer from the background context above), generate **ONLY** the final "Summary & Strategic Integration" and "Key Takeaways & Next Steps" sections for a Point-of-View (POV) report mapping {vendor_name}'s capabilities to {target_customer_name}'s needs, specifically for the {role_names}.
 
-**Background Context (Use this to inform the summary and takeaways):**
-{background_context}
+Use the background context above to inform the summary and takeaways.
 
 **Instructions for the Sections to Generate:**
 
@@ -266,7 +380,7 @@ Based on the comprehensive analysis implicitly covered across {num_outcomes} dis
 **Output:**
 Return *only* the markdown for these two final sections, formatted exactly as specified.
 """
-    return prompt
+    return with_background_context(background_context, instructions)
 
 def generate_pov_prompt(vendor_name, target_customer):
     """
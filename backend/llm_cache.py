@@ -0,0 +1,164 @@
+"""
+In-process caches for LLM generations
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+import numpy as np
+from llm import client_async, llm_call
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+SIMILARITY_THRESHOLD = 0.95
+CACHE_TTL_SECONDS = 24 * 60 * 60
+MAX_CACHED_DOCUMENTS = 1000
+MAX_ENTRIES_PER_DOCUMENT = 20
+
+
+def content_hash(text: str) -> str:
+    """Stable hash of a document's content"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def normalize_request(text: str) -> str:
+    """Lower-case and collapse whitespace so trivially different requests embed identically"""
+    return " ".join(text.lower().split())
+
+
+async def embed_texts(texts: List[str]) -> np.ndarray:
+    """Unit-normalized embeddings for a batch of texts, one row per text"""
+    response = await client_async.embeddings.create(model=EMBEDDING_MODEL, input=texts)
+    vectors = np.asarray([item.embedding for item in response.data], dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+class SemanticEditCache:
+    """
+    Cache of edit results keyed by (namespace, content hash), matched on the
+    cosine similarity of the edit request embedding.
+
+    A hit needs the exact same source content and a near-identical request, so
+    "make it shorter" and "Make it shorter." on the same draft share one LLM call.
+    """
+
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD, ttl: int = CACHE_TTL_SECONDS):
+        self.threshold = threshold
+        self.ttl = ttl
+        # (namespace, content_hash) -> [(request embedding, result, expires_at)]
+        self._entries: "OrderedDict[Tuple[str, str], List[Tuple[np.ndarray, str, float]]]" = OrderedDict()
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Unit-normalized embedding of an edit request"""
+        return (await embed_texts([normalize_request(text)]))[0]
+
+    def _live_entries(self, key: Tuple[str, str]) -> List[Tuple[np.ndarray, str, float]]:
+        now = time.time()
+        entries = [entry for entry in self._entries.get(key, []) if entry[2] > now]
+        if entries:
+            self._entries[key] = entries
+            self._entries.move_to_end(key)
+        else:
+            self._entries.pop(key, None)
+        return entries
+
+    def lookup(self, namespace: str, content: str, request_embedding: np.ndarray) -> Optional[str]:
+        """Return a cached result for a similar request against the same content, if any"""
+        entries = self._live_entries((namespace, content_hash(content)))
+        if not entries:
+            return None
+        similarities = np.stack([entry[0] for entry in entries]) @ request_embedding
+        best = int(np.argmax(similarities))
+        return entries[best][1] if similarities[best] >= self.threshold else None
+
+    def store(self, namespace: str, content: str, request_embedding: np.ndarray, result: str) -> None:
+        """Remember a result for the given content and request"""
+        key = (namespace, content_hash(content))
+        entries = self._live_entries(key)
+        entries.append((request_embedding, result, time.time() + self.ttl))
+        self._entries[key] = entries[-MAX_ENTRIES_PER_DOCUMENT:]
+        self._entries.move_to_end(key)
+        while len(self._entries) > MAX_CACHED_DOCUMENTS:
+            self._entries.popitem(last=False)
+
+    async def get(self, namespace: str, content: str, request: str) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """
+        Embed the request and look it up. Returns (cached result or None, embedding).
+        Embedding failures disable the cache for this call instead of failing the edit.
+        """
+        try:
+            request_embedding = await self.embed(request)
+        except Exception as e:
+            print(f"⚠️ Semantic cache unavailable: {e}")
+            return None, None
+        return self.lookup(namespace, content, request_embedding), request_embedding
+
+
+class RecentEditCache:
+    """
+    Exact-match LRU of edit results keyed by (namespace, hash of content + request).
+    Catches retries and double submits without an embedding round trip.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: int = CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, float]]" = OrderedDict()
+
+    @staticmethod
+    def key(namespace: str, content: str, request: str) -> Tuple[str, str]:
+        """Namespace keeps results from leaking across users/documents"""
+        return namespace, content_hash(f"{content}\0{request}")
+
+    def get(self, key: Tuple[str, str]) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def set(self, key: Tuple[str, str], result: str) -> None:
+        self._entries[key] = (result, time.time() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+class LLMResponseCache(RecentEditCache):
+    """
+    Exact-match LRU of completions keyed by (model, hash of prompt).
+    Only for deterministic (temperature 0) calls such as llm_call().
+    """
+
+    @staticmethod
+    def key(model: str, prompt: str) -> Tuple[str, str]:
+        return model, content_hash(prompt)
+
+
+async def cached_llm_call(instructions: List[str], model: str = 'gpt-4.1-mini', **kwargs) -> Tuple[List[str], list]:
+    """
+    llm_call() that answers repeated prompts from llm_responses and only sends the misses.
+    Returns (contents in instruction order, raw responses for the prompts that were sent).
+    """
+    keys = [llm_responses.key(model, instruction) for instruction in instructions]
+    contents = [llm_responses.get(key) for key in keys]
+    misses = [i for i, content in enumerate(contents) if content is None]
+    if len(misses) < len(instructions):
+        print(f"♻️ LLM response cache: {len(instructions) - len(misses)}/{len(instructions)} prompts cached")
+
+    responses = []
+    if misses:
+        fresh, responses = await llm_call(instructions=[instructions[i] for i in misses], model=model, **kwargs)
+        for i, content in zip(misses, fresh):
+            contents[i] = content
+            if content:
+                llm_responses.set(keys[i], content)
+    return contents, responses
+
+
+edit_cache = SemanticEditCache()
+recent_edits = RecentEditCache()
+llm_responses = LLMResponseCache(maxsize=512)
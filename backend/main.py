@@ -4,18 +4,29 @@ from dotenv import load_dotenv
 # Load environment variables FIRST before importing anything that needs them
 load_dotenv()
 
-from fastapi import FastAPI, HTTPException, Depends, Header, Body
-from fastapi.responses import Response, FileResponse, PlainTextResponse, JSONResponse
+from fastapi import FastAPI, HTTPException, Depends, Header, Body, BackgroundTasks
+from fastapi.responses import Response, FileResponse, PlainTextResponse, JSONResponse, StreamingResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from typing import Optional, List
-from pov_function import generate_pov_analysis_parallel, format_pov_as_markdown, generate_pov_titles_only, generate_selected_outcomes_only
+from typing import Iterable, Optional, List
+from pov_function import generate_pov_analysis_parallel, format_pov_as_markdown, generate_pov_titles_only, generate_selected_outcomes_only, gather_context, build_background_context, generate_outcome_details, llm_step, parse_outcome_titles
+from llm import acall_gpt, call_gpt, call_gpt_stream, count_tokens, warm_token_encoding, llm_call, generate_outcome_titles_prompt, generate_summary_takeaways_prompt
+from version_ops import whitepapers, marketing_assets, sales_scripts, MAX_VERSIONS
+from llm_cache import edit_cache, recent_edits
+from financial_service import get_company_financial_data as fetch_company_financial_data
+from section_edit import select_sections, build_sections_prompt, patch_sections, apply_replacements, PATCH_EDIT_INSTRUCTIONS, PATCH_EDIT_MIN_TOKENS
 import pypandoc
 import uuid
 import uvicorn
 import json
-from datetime import datetime
+import orjson
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from fetch_linkedin_profiles import close_http_client as close_linkedin_http_client
 from database import (
     create_pov_report, 
     save_outcome_titles, 
@@ -23,6 +34,7 @@ from database import (
     save_summary_and_takeaways, 
     update_report_status,
     get_pov_report_data,
+    invalidate_pov_report_cache,
     get_pov_report_data_with_auth,
     get_user_reports,
     update_selected_titles,
@@ -67,6 +79,10 @@ from database import (
     set_user_report_quotas,
     get_users_over_quota,
     supabase,
+    get_async_supabase,
+    create_grok_research,
+    get_grok_research_by_report,
+    close_async_supabase,
     # Cold call email functions
     create_cold_call_email,
     get_cold_call_emails_by_report,
@@ -92,7 +108,19 @@ API_KEY = os.getenv("API_KEY")
 if not API_KEY:
     raise ValueError("API_KEY environment variable not set")
 
-app = FastAPI(title="POV Analysis API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create the async Supabase client and load the tokenizer once so request handlers never pay the setup cost
+    await get_async_supabase()
+    try:
+        await asyncio.to_thread(warm_token_encoding)
+    except Exception as e:
+        print(f"⚠️ Could not load the tokenizer at startup: {e}")
+    yield
+    await close_async_supabase()
+    await close_linkedin_http_client()
+
+app = FastAPI(title="POV Analysis API", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Add CORS middleware
 app.add_middleware(
@@ -122,6 +150,39 @@ def create_cleanup_task(file_list):
         cleanup_temp_files_list(file_list)
     return cleanup
 
+def sse_event(payload: dict) -> str:
+    """Format a payload as a server-sent event"""
+    return f"data: {orjson.dumps(payload).decode()}\n\n"
+
+def stream_llm_response(prompt, system_prompt, on_complete, cached: Optional[str] = None, cached_prefix: Optional[str] = None):
+    """
+    Stream LLM output to the client as server-sent events.
+    Emits a "chunk" event per delta, then persists the full text via on_complete
+    and emits its result as the final "done" event. A cached result is sent as
+    a single chunk without calling the model.
+    """
+    async def event_stream():
+        chunks = []
+        try:
+            if cached is not None:
+                chunks.append(cached)
+                yield sse_event({"type": "chunk", "content": cached})
+            else:
+                async for delta in call_gpt_stream(prompt, system_prompt=system_prompt, cached_prefix=cached_prefix):
+                    chunks.append(delta)
+                    yield sse_event({"type": "chunk", "content": delta})
+            result = await on_complete("".join(chunks))
+            yield sse_event({"type": "done", **result})
+        except Exception as e:
+            print(f"❌ Streaming generation failed: {e}")
+            yield sse_event({"type": "error", "detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 class POVRequest(BaseModel):
     vendor_name: str
     vendor_url: str
@@ -279,6 +340,7 @@ class GenerateWhitepaperRequest(BaseModel):
     title: str
     custom_instructions: Optional[str] = None
     selected_outcomes: List[int] = []
+    stream: bool = False  # Stream tokens back as server-sent events
 
 class GenerateMarketingAssetRequest(BaseModel):
     user_id: str
@@ -286,6 +348,7 @@ class GenerateMarketingAssetRequest(BaseModel):
     title: str
     custom_instructions: Optional[str] = None
     selected_outcomes: List[int] = []
+    stream: bool = False  # Stream tokens back as server-sent events
 
 class GenerateSalesScriptRequest(BaseModel):
     user_id: str
@@ -294,6 +357,16 @@ class GenerateSalesScriptRequest(BaseModel):
     custom_instructions: Optional[str] = None
     selected_outcomes: List[int] = []
 
+class ChatEditRequest(BaseModel):
+    user_id: str
+    message: str
+    current_content: str = ""
+    report_id: Optional[str] = None  # Lets the report data be fetched alongside the artifact
+    stream: bool = False
+
+class RestoreRequest(BaseModel):
+    user_id: str
+
 class AdminPasswordResetRequest(BaseModel):
     new_password: str
 
@@ -338,7 +411,7 @@ async def generate_pov(
         temp_files.extend([md_path, docx_path])
         
         # Save markdown to a temporary file
-        format_pov_as_markdown(pov_markdown, md_path)
+        await format_pov_as_markdown(pov_markdown, md_path)
         
         # Determine response based on requested format
         output_format_lower = request.output_format.lower()
@@ -457,17 +530,8 @@ async def generate_pov_to_database(
 
         # NOTE: Quota will be charged only after successful generation to avoid charging for failed reports
 
+        summary_task = None
         try:
-            # Import the individual functions from pov_function for the parallel approach
-            from pov_function import (
-                process_research, 
-                process_file_content, 
-                process_linkedin_profiles
-            )
-            from llm import llm_call, generate_outcome_titles_prompt, generate_single_outcome_detail_prompt, generate_summary_takeaways_prompt
-            import asyncio
-            import json
-
             # Step 1: Gather context (same as in generate_pov_analysis_parallel)
             print("🔍 Step 1: Gathering context data...")
             print(f"   - Researching vendor: {request.vendor_url}")
@@ -475,59 +539,41 @@ async def generate_pov_to_database(
             if request.linkedin_urls:
                 print(f"   - Processing LinkedIn profiles")
             
-            tasks = [
-                process_research(request.vendor_url, "vendor"),
-                process_research(request.target_customer_url, "customer")
-            ]
-            
-            # Add LinkedIn profile fetching if URLs provided
-            if request.linkedin_urls:
-                tasks.append(process_linkedin_profiles(request.linkedin_urls))
-            
-            results = await asyncio.gather(*tasks)
+            context = await gather_context(
+                request.vendor_url, request.target_customer_url, None, None, request.linkedin_urls
+            )
             print("✅ Context gathering completed")
-            
-            # Process results
-            vendor_research = None
-            customer_research = None
-            linkedin_profiles_data = None
-            
-            for i, result in enumerate(results):
-                if result["status"] == "success":
-                    if i == 0:  # vendor research
-                        vendor_research = result["data"]
-                    elif i == 1:  # customer research
-                        customer_research = result["data"]
-                    elif i == 2:  # linkedin profiles
-                        linkedin_profiles_data = result["data"]
 
             # Create background context
-            background_context = f"""
-vendor_name: {request.vendor_name}
-vendor_url: {request.vendor_url}
-vendor_services: {request.vendor_services}
-target_customer_name: {request.target_customer_name}
-target_customer_url: {request.target_customer_url}
-role_names: {request.role_names}
-linkedin_urls: {request.linkedin_urls}
-role_context: {request.role_context}
-additional_context: {request.additional_context}
-
-Vendor Research: {json.dumps(vendor_research, indent=2) if vendor_research else "Not available"}
-Customer Research: {json.dumps(customer_research, indent=2) if customer_research else "Not available"}
-LinkedIn Profiles Analysis: {linkedin_profiles_data if linkedin_profiles_data else "Not available or not requested"}
-"""
+            background_context = build_background_context(
+                context,
+                vendor_name=request.vendor_name,
+                vendor_url=request.vendor_url,
+                vendor_services=request.vendor_services,
+                target_customer_name=request.target_customer_name,
+                target_customer_url=request.target_customer_url,
+                roles_sold_to=request.role_names,
+                linkedin_urls=request.linkedin_urls,
+                role_names=request.role_names,
+                role_context=request.role_context,
+                additional_context=request.additional_context
+            )
+
+            # The summary only depends on the background context, so it runs alongside steps 2 and 3
+            summary_prompt = generate_summary_takeaways_prompt(
+                background_context, request.vendor_name, request.target_customer_name, request.role_names, request.num_outcomes
+            )
+            summary_task = asyncio.create_task(llm_step([summary_prompt], request.model_name))
 
             # Step 2: Generate outcome titles
             print(f"🎯 Step 2: Generating {request.num_outcomes} outcome titles...")
             title_prompt = generate_outcome_titles_prompt(
                 background_context, request.vendor_name, request.target_customer_name, request.role_names, request.num_outcomes
             )
-            title_responses, _ = await llm_call(instructions=[title_prompt], model=request.model_name)
+            title_responses, _ = await llm_step([title_prompt], request.model_name)
             
             # Parse titles
-            json_string = title_responses[0].strip().strip('`').strip("json\n")
-            outcome_titles = json.loads(json_string)
+            outcome_titles = parse_outcome_titles(title_responses[0])
             print(f"✅ Generated {len(outcome_titles)} outcome titles")
             
             # Save titles to database
@@ -537,17 +583,9 @@ LinkedIn Profiles Analysis: {linkedin_profiles_data if linkedin_profiles_data el
 
             # Step 3: Generate detailed outcomes in parallel
             print(f"⚡ Step 3: Generating detailed analysis for all {request.num_outcomes} outcomes in parallel...")
-            detail_prompts = []
-            for i, title in enumerate(outcome_titles, 1):
-                print(f"   - Preparing prompt {i}: {title[:50]}...")
-                detail_prompts.append(
-                    generate_single_outcome_detail_prompt(
-                        background_context, title, request.vendor_name, request.target_customer_name, request.role_names
-                    )
-                )
-            
-            print(f"🚀 Sending {len(detail_prompts)} parallel requests to LLM...")
-            outcome_details, _ = await llm_call(instructions=detail_prompts, model=request.model_name)
+            outcome_details = await generate_outcome_details(
+                background_context, outcome_titles, request.vendor_name, request.target_customer_name, request.role_names, request.model_name
+            )
             print(f"✅ Received {len(outcome_details)} detailed outcome analyses")
             
             # Save outcomes to database
@@ -555,12 +593,9 @@ LinkedIn Profiles Analysis: {linkedin_profiles_data if linkedin_profiles_data el
             await save_outcome_details(report_id, outcome_details)
             print("✅ Outcome details saved to database")
 
-            # Step 4: Generate summary and takeaways
-            print("📊 Step 4: Generating summary and strategic takeaways...")
-            summary_prompt = generate_summary_takeaways_prompt(
-                background_context, request.vendor_name, request.target_customer_name, request.role_names, request.num_outcomes
-            )
-            summary_responses, _ = await llm_call(instructions=[summary_prompt], model=request.model_name)
+            # Step 4: Collect summary and takeaways (started alongside step 2)
+            print("📊 Step 4: Waiting for summary and strategic takeaways...")
+            summary_responses, _ = await summary_task
             summary_content = summary_responses[0] if summary_responses else ""
             print("✅ Summary and takeaways generated")
             
@@ -595,6 +630,8 @@ LinkedIn Profiles Analysis: {linkedin_profiles_data if linkedin_profiles_data el
 
         except Exception as generation_error:
             print(f"❌ Error during POV generation: {str(generation_error)}")
+            if summary_task:
+                summary_task.cancel()
             # Update report status to failed
             await update_report_status(report_id, "failed")
             raise HTTPException(
@@ -1079,7 +1116,6 @@ async def generate_pov_titles(
             # Save Grok research data separately (if available)
             if grok_research_data:
                 print("💾 Saving Grok research to separate table...")
-                from database import create_grok_research
                 await create_grok_research(
                     report_id=report_id,
                     user_id=request.user_id,
@@ -1205,7 +1241,6 @@ async def generate_pov_outcomes(
         
         try:
             # Get Grok research for this report
-            from database import get_grok_research_by_report
             grok_research = await get_grok_research_by_report(report_id, user_id)
             
             # Generate detailed analysis for selected outcomes only
@@ -1435,6 +1470,7 @@ async def delete_report(
         
         # Finally delete the main report
         report_delete_result = supabase.table("pov_reports").delete().eq("id", report_id).eq("user_id", user_id).execute()
+        invalidate_pov_report_cache(report_id)
         print(f"🗑️  Deleted main report record")
         
         print(f"✅ Report {report_id} deleted successfully")
@@ -2507,8 +2543,6 @@ async def admin_reset_password(
         
         # Reset password using Supabase admin API
         print(f"🔑 Updating password for user: {user_id}")
-        from database import supabase
-        
         # Update the user's password in Supabase Auth
         auth_response = supabase.auth.admin.update_user_by_id(
             user_id, 
@@ -2611,7 +2645,7 @@ async def generate_email_proposal(
         - Additional Context: {report_data['report'].get('additional_context', 'Not specified')}
 
         **Key Outcomes from POV Analysis:**
-        {chr(10).join([f"• {outcome}" for outcome in report_data['outcomes'][:5]])}
+        {chr(10).join(f"• {outcome}" for outcome in report_data['outcomes'][:5])}
 
         **Custom Instructions:**
         {custom_instructions}
@@ -2639,7 +2673,7 @@ async def generate_email_proposal(
         - Additional Context: {report_data['report'].get('additional_context', 'Not specified')}
 
         **Key Outcomes from POV Analysis:**
-        {chr(10).join([f"• {outcome}" for outcome in report_data['outcomes']])}
+        {chr(10).join(f"• {outcome}" for outcome in report_data['outcomes'])}
 
         **Custom Instructions:**
         {custom_instructions}
@@ -2659,8 +2693,6 @@ async def generate_email_proposal(
         
         # Generate email and proposal using AI
         print("🤖 Generating email content...")
-        from llm import llm_call
-        
         email_responses, _ = await llm_call(
             instructions=[email_prompt],
             model=report_data['report'].get('model_name', 'gpt-4.1-mini')
@@ -2721,7 +2753,6 @@ async def generate_cold_call_email(
         
         # Get selected outcomes based on indices
         # First, get the full outcome data from database
-        from database import supabase
         outcomes_result = supabase.table("pov_outcomes").select("*").eq("report_id", report_id).order("outcome_index").execute()
         
         if not outcomes_result.data:
@@ -2812,8 +2843,6 @@ async def generate_cold_call_email(
         
         # Generate email using AI
         print("🤖 Generating cold call email content...")
-        from llm import call_gpt
-        
         email_content, completion = call_gpt(
             prompt=email_prompt,
             system_prompt="You are an expert sales professional who writes compelling, personalized cold call emails.",
@@ -2823,7 +2852,6 @@ async def generate_cold_call_email(
         print("✅ Email generated successfully")
         
         # Parse the JSON response
-        import json
         try:
             email_data = json.loads(email_content)
             subject = email_data.get('subject', 'Introduction and Collaboration Opportunity')
@@ -2920,9 +2948,10 @@ async def chat_edit_cold_call_email(
         email_data = email_result.data
         report_data = await get_pov_report_data(email_data["report_id"], user_id)
         
-        # Get current version history and version number
-        version_history = email_data.get("version_history", [])
+        # Get current version history (bounded to the newest MAX_VERSIONS entries) and version number
+        version_history = deque(email_data.get("version_history") or [], maxlen=MAX_VERSIONS)
         current_version_num = email_data.get("current_version", 1)
+        now_iso = datetime.now(timezone.utc).isoformat()
         
         # Save current version to history before updating
         # For the first edit, save the original as version 1
@@ -2931,7 +2960,7 @@ async def chat_edit_cold_call_email(
                 "version": 1,
                 "content": email_data["email_body"],
                 "subject": email_data["subject"],
-                "edited_at": email_data.get("created_at", datetime.now().isoformat()),
+                "edited_at": email_data.get("created_at", now_iso),
                 "edit_message": "Original version",
                 "edited_by": user_id
             }
@@ -2966,7 +2995,6 @@ async def chat_edit_cold_call_email(
         [updated email body]
         """
         
-        from llm import call_gpt
         updated_response, _ = call_gpt(
             prompt=prompt,
             system_prompt="You are a professional email editor. Make precise, impactful improvements based on user requests.",
@@ -2987,17 +3015,14 @@ async def chat_edit_cold_call_email(
                         break
                 break
         
-        # Keep only last 20 versions to prevent excessive storage
-        if len(version_history) > 20:
-            version_history = version_history[-20:]
-        
         # Update the email with new content and version history
+        version_history = list(version_history)
         supabase.table("cold_call_emails").update({
             "email_body": updated_content,
             "subject": updated_subject,
             "version_history": version_history,
             "current_version": current_version_num + 1,
-            "updated_at": datetime.now().isoformat()
+            "updated_at": now_iso
         }).eq("id", email_id).eq("user_id", user_id).execute()
         
         return {
@@ -3053,8 +3078,9 @@ async def restore_cold_call_email_version(
             raise HTTPException(status_code=404, detail="Cold call email not found")
         
         email_data = result.data
-        version_history = email_data.get("version_history", [])
+        version_history = deque(email_data.get("version_history") or [], maxlen=MAX_VERSIONS)
         current_version_num = email_data.get("current_version", 1)
+        now_iso = datetime.now(timezone.utc).isoformat()
         
         # Find the version to restore
         version_to_restore = None
@@ -3075,19 +3101,16 @@ async def restore_cold_call_email_version(
             "edit_message": f"Before restoring to version {version_number}",
             "edited_by": user_id
         }
+        # Appending past MAX_VERSIONS drops the oldest entry
         version_history.append(current_entry)
         
-        # Keep only last 20 versions
-        if len(version_history) > 20:
-            version_history = version_history[-20:]
-        
         # Restore the selected version
         supabase.table("cold_call_emails").update({
             "email_body": version_to_restore["content"],
             "subject": version_to_restore.get("subject", email_data["subject"]),
-            "version_history": version_history,
+            "version_history": list(version_history),
             "current_version": current_version_num + 1,
-            "updated_at": datetime.now().isoformat()
+            "updated_at": now_iso
         }).eq("id", email_id).eq("user_id", user_id).execute()
         
         return {
@@ -3103,6 +3126,59 @@ async def restore_cold_call_email_version(
 # ===============================
 # WHITEPAPER
 # ===============================
+WHITEPAPER_PROMPT_TEMPLATE = """
+You are an expert enterprise analyst. Write a Classic White Paper in a clear, executive-ready style.
+
+Context:
+{pov_context_md}
+- POV Summary: {summary}
+- POV Takeaways: {takeaways}
+- Selected Outcomes:
+{selected_outcomes_text}
+- Custom Instructions: {custom_instructions}
+
+Output requirements (use Markdown headings exactly as below):
+# {title}
+
+## Executive Summary
+Provide a tight summary tailored for executives.
+
+## 1. The Strategic Challenge
+Describe the decision context, constraints, and risks (1-2 paragraphs).
+
+## 2. Why This Matters Now
+Explain urgency, market dynamics, and competitive pressure.
+
+## 3. Three Strategic Outcomes for {customer_name}
+- Outcome 1: name and 2-3 supporting points using selected outcomes.
+- Outcome 2: name and 2-3 supporting points using selected outcomes.
+- Outcome 3: name and 2-3 supporting points using selected outcomes.
+
+## 4. The Human Dimension
+Address confidence, relief, pride, and adoption considerations.
+
+## 5. Proposed Approach
+Lay out a pragmatic approach (phases or streams) grounded in the POV.
+
+## 6. Evidence & Outcomes
+Tie recommendations to POV outcomes and titles; be specific.
+
+## 7. Strategic Alignment
+Map to the customer's mission and KPIs.
+
+## Conclusion & Call to Action
+Close with next steps suitable for executive sign-off.
+
+Style:
+- Be concise but authoritative. Use data points from POV where relevant.
+- Avoid fluff. Keep jargon minimal. Prefer active voice.
+"""
+
+def format_bullet_list(items: Iterable[str]) -> str:
+    """Render items as a markdown bullet list"""
+    text = "\n- ".join(items)
+    return "- " + text if text else ""
+
 @app.post("/generate-whitepaper/{report_id}")
 async def generate_whitepaper(
     report_id: str,
@@ -3116,106 +3192,57 @@ async def generate_whitepaper(
             raise HTTPException(status_code=404, detail="Report not found")
 
         # Build prompt from POV data with selected outcomes and structured sections
-        roles_str = report_data['report'].get('role_names','')
-        all_titles = report_data.get('titles', [])
-        pov_summary = report_data.get('summary', {})
-        sum_content = pov_summary.get('summary_content', '') if pov_summary else ''
-        sum_takeaways = pov_summary.get('takeaways_content', '') if pov_summary else ''
+        pov_summary = report_data.get('summary') or {}
 
         # Derive selected outcomes text if indices provided
         selected_outcomes_text = ""
         try:
             source_outcomes = report_data.get('outcomes', []) or []
-            selected_texts = []
             if request.selected_outcomes:
-                for i in request.selected_outcomes:
-                    if 0 <= i < len(source_outcomes):
-                        o = source_outcomes[i]
-                        if isinstance(o, dict):
-                            selected_texts.append(str(o.get('title') or o.get('summary') or o))
-                        else:
-                            selected_texts.append(str(o))
-            if selected_texts:
-                selected_outcomes_text = "\n".join([f"- {t}" for t in selected_texts])
+                selected_outcomes_text = format_bullet_list(
+                    str(source_outcomes[i].get('title') or source_outcomes[i].get('summary') or source_outcomes[i])
+                    if isinstance(source_outcomes[i], dict) else str(source_outcomes[i])
+                    for i in request.selected_outcomes if 0 <= i < len(source_outcomes)
+                )
         except Exception:
             selected_outcomes_text = ""
 
-        titles_text = "\n".join([f"- {t}" for t in all_titles]) if all_titles else ""
-
-        prompt = f"""
-        You are an expert enterprise analyst. Write a Classic White Paper in a clear, executive-ready style.
-
-        Context:
-        - Vendor: {report_data['report']['vendor_name']}
-        - Services: {report_data['report']['vendor_services']}
-        - Customer: {report_data['report']['target_customer_name']}
-        - Roles: {roles_str}
-        - POV Titles:\n{titles_text}
-        - POV Summary: {sum_content}
-        - POV Takeaways: {sum_takeaways}
-        - Selected Outcomes:\n{selected_outcomes_text or '(Use the most relevant POV outcomes and titles as evidence)'}
-        - Custom Instructions: {request.custom_instructions or 'None'}
-
-        Output requirements (use Markdown headings exactly as below):
-        # {request.title}
-
-        ## Executive Summary
-        Provide a tight summary tailored for executives.
-
-        ## 1. The Strategic Challenge
-        Describe the decision context, constraints, and risks (1-2 paragraphs).
-
-        ## 2. Why This Matters Now
-        Explain urgency, market dynamics, and competitive pressure.
-
-        ## 3. Three Strategic Outcomes for {report_data['report']['target_customer_name']}
-        - Outcome 1: name and 2-3 supporting points using selected outcomes.
-        - Outcome 2: name and 2-3 supporting points using selected outcomes.
-        - Outcome 3: name and 2-3 supporting points using selected outcomes.
-
-        ## 4. The Human Dimension
-        Address confidence, relief, pride, and adoption considerations.
-
-        ## 5. Proposed Approach
-        Lay out a pragmatic approach (phases or streams) grounded in the POV.
-
-        ## 6. Evidence & Outcomes
-        Tie recommendations to POV outcomes and titles; be specific.
-
-        ## 7. Strategic Alignment
-        Map to the customer's mission and KPIs.
-
-        ## Conclusion & Call to Action
-        Close with next steps suitable for executive sign-off.
+        prompt = WHITEPAPER_PROMPT_TEMPLATE.format_map({
+            "title": request.title,
+            "pov_context_md": report_data['pov_context_md'],
+            "customer_name": report_data['report']['target_customer_name'],
+            "summary": pov_summary.get('summary_content', ''),
+            "takeaways": pov_summary.get('takeaways_content', ''),
+            "selected_outcomes_text": selected_outcomes_text or '(Use the most relevant POV outcomes and titles as evidence)',
+            "custom_instructions": request.custom_instructions or 'None',
+        })
 
-        Style:
-        - Be concise but authoritative. Use data points from POV where relevant.
-        - Avoid fluff. Keep jargon minimal. Prefer active voice.
-        """
+        async def save_whitepaper(content: str) -> dict:
+            data = {
+                "report_id": report_id,
+                "user_id": request.user_id,
+                "title": request.title,
+                "content": content,
+            }
+            db = await get_async_supabase()
+            result = await db.table("whitepapers").insert(data).execute()
+            saved = result.data[0] if result.data else data
+            return {"message": "Whitepaper generated", "id": saved.get("id"), "item": saved}
 
-        from llm import call_gpt
-        content, _ = call_gpt(
-            prompt=prompt,
-            system_prompt="You are a senior analyst who writes enterprise-grade whitepapers.",
-        )
+        system_prompt = "You are a senior analyst who writes enterprise-grade whitepapers."
+        if request.stream:
+            return stream_llm_response(prompt, system_prompt, save_whitepaper)
 
-        # Save to DB
-        data = {
-            "report_id": report_id,
-            "user_id": request.user_id,
-            "title": request.title,
-            "content": content,
-        }
-        result = supabase.table("whitepapers").insert(data).execute()
-        saved = result.data[0] if result.data else data
-        return {"message": "Whitepaper generated", "id": saved.get("id"), "item": saved}
+        content, _ = call_gpt(prompt=prompt, system_prompt=system_prompt)
+        return await save_whitepaper(content)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/whitepapers/{report_id}")
 async def get_whitepapers(report_id: str, user_id: str, api_key: str = Depends(verify_api_key)):
     try:
-        res = supabase.table("whitepapers").select("*").eq("report_id", report_id).eq("user_id", user_id).order("created_at", desc=True).execute()
+        db = await get_async_supabase()
+        res = await db.table("whitepapers").select("*").eq("report_id", report_id).eq("user_id", user_id).order("created_at", desc=True).execute()
         return {"items": res.data or []}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -3224,6 +3251,7 @@ async def get_whitepapers(report_id: str, user_id: str, api_key: str = Depends(v
 async def chat_edit_whitepaper(
     whitepaper_id: str,
     request: dict,
+    background_tasks: BackgroundTasks,
     api_key: str = Depends(verify_api_key)
 ):
     """
@@ -3237,30 +3265,14 @@ async def chat_edit_whitepaper(
         if not edit_request.strip():
             raise HTTPException(status_code=400, detail="Edit request is required")
         
-        # Get original whitepaper data including version history
-        whitepaper_result = supabase.table("whitepapers").select("*").eq("id", whitepaper_id).eq("user_id", user_id).single().execute()
-        if not whitepaper_result.data:
-            raise HTTPException(status_code=404, detail="Whitepaper not found")
-        
-        whitepaper = whitepaper_result.data
-        report_data = await get_pov_report_data(whitepaper["report_id"], user_id)
-        
-        # Get current version history and version number
-        version_history = whitepaper.get("version_history", [])
-        current_version_num = whitepaper.get("current_version", 1)
-        
-        # Save current version to history before updating
-        # For the first edit, save the original as version 1
-        if current_version_num == 1 and len(version_history) == 0:
-            original_entry = {
-                "version": 1,
-                "content": whitepaper["content"],
-                "title": whitepaper["title"],
-                "edited_at": whitepaper.get("created_at", datetime.now().isoformat()),
-                "edit_message": "Original version",
-                "edited_by": user_id
-            }
-            version_history.append(original_entry)
+        # When the client tells us the report up front, fetch the whitepaper and POV data concurrently
+        report_id = request.get("report_id")
+        if report_id:
+            whitepaper, report_data = await asyncio.gather(whitepapers.get(whitepaper_id, user_id), get_pov_report_data(report_id, user_id))
+        else:
+            whitepaper, report_data = await whitepapers.get(whitepaper_id, user_id), None
+        if report_data is None or whitepaper["report_id"] != report_id:
+            report_data = await get_pov_report_data(whitepaper["report_id"], user_id)
         
         # Build chat editing prompt
         prompt = f"""
@@ -3284,32 +3296,68 @@ async def chat_edit_whitepaper(
         Updated whitepaper:
         """
         
-        from llm import call_gpt
-        updated_content, _ = call_gpt(
-            prompt=prompt,
-            system_prompt="You are a professional whitepaper editor. Make precise, thoughtful improvements based on user requests.",
-        )
+        # Reuse the result of an identical (retry / double submit) or near-identical request against the same content
+        cache_namespace = f"whitepaper:{user_id}:{whitepaper_id}"
+        exact_key = recent_edits.key(cache_namespace, current_content, edit_request)
+        cached_content, request_embedding = recent_edits.get(exact_key), None
+        if cached_content is None:
+            cached_content, request_embedding = await edit_cache.get(cache_namespace, current_content, edit_request)
+        
+        async def save_edit(updated_content: str) -> dict:
+            # The guarded row update is awaited so the returned version is real; the history snapshot is written after the response
+            new_version = await whitepapers.edit(whitepaper, whitepaper_id, user_id, updated_content, edit_request, background_tasks)
+            recent_edits.set(exact_key, updated_content)
+            if cached_content is None and request_embedding is not None:
+                edit_cache.store(cache_namespace, current_content, request_embedding, updated_content)
+            return {
+                "message": "Whitepaper updated successfully",
+                "updated_content": updated_content,
+                "edit_request": edit_request,
+                "version": new_version
+            }
         
-        # Keep only last 20 versions to prevent excessive storage
-        if len(version_history) > 20:
-            version_history = version_history[-20:]
+        system_prompt = "You are a professional whitepaper editor. Make precise, thoughtful improvements based on user requests."
+        if request.get("stream"):
+            return stream_llm_response(prompt, system_prompt, save_edit, cached=cached_content)
+        if cached_content is not None:
+            print(f"♻️ Cache hit for edit: {edit_request[:50]}")
+            return await save_edit(cached_content)
+        
+        # Long whitepapers: send only the sections the request is about and patch them back
+        scoped = await select_sections(current_content, edit_request)
+        if scoped:
+            sections, selected = scoped
+            scoped_prompt = f"""
+        You are an expert editor helping to improve a whitepaper. The user wants you to: {edit_request}
+
+        The whitepaper is split into numbered sections. Only the sections relevant to the request are shown in full; the others are omitted.
+
+        {build_sections_prompt(sections, selected)}
+
+        Original POV context for reference:
+        - Vendor: {report_data['report']['vendor_name']}
+        - Customer: {report_data['report']['target_customer_name']}
+        - POV Outcomes: {', '.join(report_data.get('titles', [])[:5])}
         
-        # Update the whitepaper with new content and version history
-        supabase.table("whitepapers").update({
-            "content": updated_content,
-            "version_history": version_history,
-            "current_version": current_version_num + 1,
-            "updated_at": datetime.now().isoformat()
-        }).eq("id", whitepaper_id).eq("user_id", user_id).execute()
+        Instructions:
+        - Make the requested changes while maintaining the whitepaper's professional tone
+        - Only edit the sections shown in full
+        - Return every section shown in full, each starting with its <<<SECTION N>>> marker line, and nothing else
+        - Preserve markdown formatting
+        """
+            section_response, _ = call_gpt(prompt=scoped_prompt, system_prompt=system_prompt)
+            updated_content = patch_sections(sections, selected, section_response)
+            if updated_content is not None:
+                print(f"✂️ Section-scoped edit: sent {len(selected)} of {len(sections)} sections")
+                return await save_edit(updated_content)
+            print("⚠️ Section-scoped edit could not be patched back, retrying with the full whitepaper")
         
-        return {
-            "message": "Whitepaper updated successfully",
-            "updated_content": updated_content,
-            "edit_request": edit_request,
-            "version": current_version_num + 1,
-            "version_history": version_history
-        }
+        updated_content, _ = call_gpt(prompt=prompt, system_prompt=system_prompt)
+        return await save_edit(updated_content)
         
+    except HTTPException:
+        # e.g. 409 from a concurrent edit of the same document
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -3323,15 +3371,22 @@ async def get_whitepaper_versions(
     Get version history for a whitepaper
     """
     try:
-        result = supabase.table("whitepapers").select("version_history, current_version, title").eq("id", whitepaper_id).eq("user_id", user_id).single().execute()
-        if not result.data:
-            raise HTTPException(status_code=404, detail="Whitepaper not found")
-        
-        return {
-            "current_version": result.data.get("current_version", 1),
-            "current_title": result.data.get("title", ""),
-            "versions": result.data.get("version_history", [])
-        }
+        return await whitepapers.list_versions(whitepaper_id, user_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/whitepapers/{whitepaper_id}/versions/{version_number}/content")
+async def get_whitepaper_version_content(
+    whitepaper_id: str,
+    version_number: int,
+    user_id: str,
+    api_key: str = Depends(verify_api_key)
+):
+    """
+    Get the full content of one whitepaper version (the versions list only returns metadata)
+    """
+    try:
+        return await whitepapers.get_version_content(whitepaper_id, user_id, version_number)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -3347,55 +3402,7 @@ async def restore_whitepaper_version(
     """
     try:
         user_id = request.get("user_id")
-        
-        # Get whitepaper with version history
-        result = supabase.table("whitepapers").select("*").eq("id", whitepaper_id).eq("user_id", user_id).single().execute()
-        if not result.data:
-            raise HTTPException(status_code=404, detail="Whitepaper not found")
-        
-        whitepaper = result.data
-        version_history = whitepaper.get("version_history", [])
-        current_version_num = whitepaper.get("current_version", 1)
-        
-        # Find the version to restore
-        version_to_restore = None
-        for version in version_history:
-            if version.get("version") == version_number:
-                version_to_restore = version
-                break
-        
-        if not version_to_restore:
-            raise HTTPException(status_code=404, detail=f"Version {version_number} not found")
-        
-        # Save current version to history before restoring
-        current_entry = {
-            "version": current_version_num,
-            "content": whitepaper["content"],
-            "title": whitepaper["title"],
-            "edited_at": whitepaper.get("updated_at", whitepaper.get("created_at")),
-            "edit_message": f"Before restoring to version {version_number}",
-            "edited_by": user_id
-        }
-        version_history.append(current_entry)
-        
-        # Keep only last 20 versions
-        if len(version_history) > 20:
-            version_history = version_history[-20:]
-        
-        # Restore the selected version
-        supabase.table("whitepapers").update({
-            "content": version_to_restore["content"],
-            "title": version_to_restore.get("title", whitepaper["title"]),
-            "version_history": version_history,
-            "current_version": current_version_num + 1,
-            "updated_at": datetime.now().isoformat()
-        }).eq("id", whitepaper_id).eq("user_id", user_id).execute()
-        
-        return {
-            "message": f"Successfully restored version {version_number}",
-            "restored_content": version_to_restore["content"],
-            "new_version": current_version_num + 1
-        }
+        return await whitepapers.restore(whitepaper_id, user_id, version_number)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -3415,29 +3422,21 @@ async def generate_marketing_asset(
         if not report_data:
             raise HTTPException(status_code=404, detail="Report not found")
 
-        titles_text = "\n".join([f"- {t}" for t in report_data.get('titles', [])])
         selected_outcomes_text = ''
         try:
             source_outcomes = report_data.get('outcomes', []) or []
             if request.selected_outcomes:
-                selected = []
-                for i in request.selected_outcomes:
-                    if 0 <= i < len(source_outcomes):
-                        o = source_outcomes[i]
-                        selected.append(str(o.get('title') if isinstance(o, dict) else o))
-                if selected:
-                    selected_outcomes_text = "\n".join([f"- {t}" for t in selected])
+                selected_outcomes_text = format_bullet_list(
+                    str(source_outcomes[i].get('title') if isinstance(source_outcomes[i], dict) else source_outcomes[i])
+                    for i in request.selected_outcomes if 0 <= i < len(source_outcomes)
+                )
         except Exception:
             selected_outcomes_text = ''
 
         prompt = f"""
         Create a {request.asset_type} titled: {request.title}
         Context:
-        - Vendor: {report_data['report']['vendor_name']}
-        - Services: {report_data['report']['vendor_services']}
-        - Customer: {report_data['report']['target_customer_name']}
-        - Roles: {report_data['report'].get('role_names','')}
-        - POV Titles:\n{titles_text}
+{report_data['pov_context_md']}
         - Selected Outcomes:\n{selected_outcomes_text or '(Use the most relevant POV outcomes/titles)'}
         - Custom Instructions: {request.custom_instructions or 'None'}
 
@@ -3446,26 +3445,33 @@ async def generate_marketing_asset(
         - Keep it concise and compelling, suitable for go-to-market use.
         - Include specific hooks or CTAs when appropriate.
         """
-        from llm import call_gpt
-        content, _ = call_gpt(prompt=prompt, system_prompt="You are a marketing writer generating concise, compelling content.")
+        async def save_marketing_asset(content: str) -> dict:
+            item = {
+                "report_id": report_id,
+                "user_id": request.user_id,
+                "asset_type": request.asset_type,
+                "title": request.title,
+                "content": content,
+            }
+            db = await get_async_supabase()
+            result = await db.table("marketing_assets").insert(item).execute()
+            saved = result.data[0] if result.data else item
+            return {"message": "Marketing asset generated", "id": saved.get("id"), "item": saved}
 
-        item = {
-            "report_id": report_id,
-            "user_id": request.user_id,
-            "asset_type": request.asset_type,
-            "title": request.title,
-            "content": content,
-        }
-        result = supabase.table("marketing_assets").insert(item).execute()
-        saved = result.data[0] if result.data else item
-        return {"message": "Marketing asset generated", "id": saved.get("id"), "item": saved}
+        system_prompt = "You are a marketing writer generating concise, compelling content."
+        if request.stream:
+            return stream_llm_response(prompt, system_prompt, save_marketing_asset)
+
+        content, _ = call_gpt(prompt=prompt, system_prompt=system_prompt)
+        return await save_marketing_asset(content)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/marketing-assets/{report_id}")
 async def get_marketing_assets(report_id: str, user_id: str, api_key: str = Depends(verify_api_key)):
     try:
-        res = supabase.table("marketing_assets").select("*").eq("report_id", report_id).eq("user_id", user_id).order("created_at", desc=True).execute()
+        db = await get_async_supabase()
+        res = await db.table("marketing_assets").select("*").eq("report_id", report_id).eq("user_id", user_id).order("created_at", desc=True).execute()
         return {"items": res.data or []}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -3474,6 +3480,7 @@ async def get_marketing_assets(report_id: str, user_id: str, api_key: str = Depe
 async def chat_edit_marketing_asset(
     asset_id: str,
     request: dict,
+    background_tasks: BackgroundTasks,
     api_key: str = Depends(verify_api_key)
 ):
     """
@@ -3487,30 +3494,14 @@ async def chat_edit_marketing_asset(
         if not edit_request.strip():
             raise HTTPException(status_code=400, detail="Edit request is required")
         
-        # Get original asset data including version history
-        asset_result = supabase.table("marketing_assets").select("*").eq("id", asset_id).eq("user_id", user_id).single().execute()
-        if not asset_result.data:
-            raise HTTPException(status_code=404, detail="Marketing asset not found")
-        
-        asset = asset_result.data
-        report_data = await get_pov_report_data(asset["report_id"], user_id)
-        
-        # Get current version history and version number
-        version_history = asset.get("version_history", [])
-        current_version_num = asset.get("current_version", 1)
-        
-        # Save current version to history before updating
-        # For the first edit, save the original as version 1
-        if current_version_num == 1 and len(version_history) == 0:
-            original_entry = {
-                "version": 1,
-                "content": asset["content"],
-                "title": asset["title"],
-                "edited_at": asset.get("created_at", datetime.now().isoformat()),
-                "edit_message": "Original version",
-                "edited_by": user_id
-            }
-            version_history.append(original_entry)
+        # When the client tells us the report up front, fetch the marketing asset and POV data concurrently
+        report_id = request.get("report_id")
+        if report_id:
+            asset, report_data = await asyncio.gather(marketing_assets.get(asset_id, user_id), get_pov_report_data(report_id, user_id))
+        else:
+            asset, report_data = await marketing_assets.get(asset_id, user_id), None
+        if report_data is None or asset["report_id"] != report_id:
+            report_data = await get_pov_report_data(asset["report_id"], user_id)
         
         # Build chat editing prompt
         prompt = f"""
@@ -3536,32 +3527,39 @@ async def chat_edit_marketing_asset(
         Updated content:
         """
         
-        from llm import call_gpt
-        updated_content, _ = call_gpt(
-            prompt=prompt,
-            system_prompt="You are a professional marketing content editor. Make precise, impactful improvements based on user requests.",
-        )
-        
-        # Keep only last 20 versions to prevent excessive storage
-        if len(version_history) > 20:
-            version_history = version_history[-20:]
+        # Reuse the result of an identical (retry / double submit) or near-identical request against the same content
+        cache_namespace = f"marketing_asset:{user_id}:{asset_id}"
+        exact_key = recent_edits.key(cache_namespace, current_content, edit_request)
+        cached_content, request_embedding = recent_edits.get(exact_key), None
+        if cached_content is None:
+            cached_content, request_embedding = await edit_cache.get(cache_namespace, current_content, edit_request)
+        
+        async def save_edit(updated_content: str) -> dict:
+            # The guarded row update is awaited so the returned version is real; the history snapshot is written after the response
+            new_version = await marketing_assets.edit(asset, asset_id, user_id, updated_content, edit_request, background_tasks)
+            recent_edits.set(exact_key, updated_content)
+            if cached_content is None and request_embedding is not None:
+                edit_cache.store(cache_namespace, current_content, request_embedding, updated_content)
+            return {
+                "message": "Marketing asset updated successfully",
+                "updated_content": updated_content,
+                "edit_request": edit_request,
+                "version": new_version
+            }
         
-        # Update the asset with new content and version history
-        supabase.table("marketing_assets").update({
-            "content": updated_content,
-            "version_history": version_history,
-            "current_version": current_version_num + 1,
-            "updated_at": datetime.now().isoformat()
-        }).eq("id", asset_id).eq("user_id", user_id).execute()
+        system_prompt = "You are a professional marketing content editor. Make precise, impactful improvements based on user requests."
+        if request.get("stream"):
+            return stream_llm_response(prompt, system_prompt, save_edit, cached=cached_content)
+        if cached_content is not None:
+            print(f"♻️ Cache hit for edit: {edit_request[:50]}")
+            return await save_edit(cached_content)
         
-        return {
-            "message": "Marketing asset updated successfully",
-            "updated_content": updated_content,
-            "edit_request": edit_request,
-            "version": current_version_num + 1,
-            "version_history": version_history
-        }
+        updated_content, _ = call_gpt(prompt=prompt, system_prompt=system_prompt)
+        return await save_edit(updated_content)
         
+    except HTTPException:
+        # e.g. 409 from a concurrent edit of the same document
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -3575,15 +3573,22 @@ async def get_marketing_asset_versions(
     Get version history for a marketing asset
     """
     try:
-        result = supabase.table("marketing_assets").select("version_history, current_version, title").eq("id", asset_id).eq("user_id", user_id).single().execute()
-        if not result.data:
-            raise HTTPException(status_code=404, detail="Marketing asset not found")
-        
-        return {
-            "current_version": result.data.get("current_version", 1),
-            "current_title": result.data.get("title", ""),
-            "versions": result.data.get("version_history", [])
-        }
+        return await marketing_assets.list_versions(asset_id, user_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/marketing-assets/{asset_id}/versions/{version_number}/content")
+async def get_marketing_asset_version_content(
+    asset_id: str,
+    version_number: int,
+    user_id: str,
+    api_key: str = Depends(verify_api_key)
+):
+    """
+    Get the full content of one marketing asset version (the versions list only returns metadata)
+    """
+    try:
+        return await marketing_assets.get_version_content(asset_id, user_id, version_number)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -3599,55 +3604,7 @@ async def restore_marketing_asset_version(
     """
     try:
         user_id = request.get("user_id")
-        
-        # Get asset with version history
-        result = supabase.table("marketing_assets").select("*").eq("id", asset_id).eq("user_id", user_id).single().execute()
-        if not result.data:
-            raise HTTPException(status_code=404, detail="Marketing asset not found")
-        
-        asset = result.data
-        version_history = asset.get("version_history", [])
-        current_version_num = asset.get("current_version", 1)
-        
-        # Find the version to restore
-        version_to_restore = None
-        for version in version_history:
-            if version.get("version") == version_number:
-                version_to_restore = version
-                break
-        
-        if not version_to_restore:
-            raise HTTPException(status_code=404, detail=f"Version {version_number} not found")
-        
-        # Save current version to history before restoring
-        current_entry = {
-            "version": current_version_num,
-            "content": asset["content"],
-            "title": asset["title"],
-            "edited_at": asset.get("updated_at", asset.get("created_at")),
-            "edit_message": f"Before restoring to version {version_number}",
-            "edited_by": user_id
-        }
-        version_history.append(current_entry)
-        
-        # Keep only last 20 versions
-        if len(version_history) > 20:
-            version_history = version_history[-20:]
-        
-        # Restore the selected version
-        supabase.table("marketing_assets").update({
-            "content": version_to_restore["content"],
-            "title": version_to_restore.get("title", asset["title"]),
-            "version_history": version_history,
-            "current_version": current_version_num + 1,
-            "updated_at": datetime.now().isoformat()
-        }).eq("id", asset_id).eq("user_id", user_id).execute()
-        
-        return {
-            "message": f"Successfully restored version {version_number}",
-            "restored_content": version_to_restore["content"],
-            "new_version": current_version_num + 1
-        }
+        return await marketing_assets.restore(asset_id, user_id, version_number)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -3655,6 +3612,78 @@ async def restore_marketing_asset_version(
 # ===============================
 # SALES SCRIPTS
 # ===============================
+# Static prompt prefixes - never interpolate request values here so they stay
+# byte-identical across users and hit the provider's prompt cache
+SALES_SCRIPT_PROMPT_PREFIX = """
+You are a sales coach. Write a sales script for the scenario and title in the script request below, with the structure and tone below.
+
+Modelling Considerations
+Data Sources used in generating the script:
+- POV Sales Role
+- POV CEO Role
+- Sales Rubric
+- Grok (web research, if available)
+
+Output format (use these exact sections and casing):
+Sales Script Version 1
+<the script title>
+TARGET AUDIENCE: derive from roles and buyer context
+SPEAKER: <the vendor> sales consultant
+ESTIMATED DURATION: 60–120 seconds
+WORD COUNT: 150–220 words
+
+Then provide the script content using bracketed cues like [PAUSE], [EMPHASIS] where impactful.
+
+After the script, include:
+KEY TALKING POINTS FOR REFERENCE:
+- Primary pain point: one sentence
+- Core outcome promised: one sentence
+- Main differentiator: one sentence
+- Success metric mentioned: one sentence (tie to POV evidence when possible)
+
+Tone:
+- Credible, specific, and outcome-driven. Avoid generic claims.
+- Use concrete examples aligned to the POV when helpful.
+"""
+
+SALES_SCRIPT_EDIT_PREFIX = """
+You are an expert editor helping to improve a sales script. The user's requested change, the current script and the POV context follow below.
+
+Instructions:
+- Make the requested changes while maintaining conversational and professional tone
+- Keep the script appropriate for its scenario type
+- Ensure changes are relevant to the POV context
+- Return the complete updated sales script content
+- Preserve dialogue formatting and speaker indicators
+"""
+
+# Request-specific parts of the sales script prompts, filled with format_map per request
+SALES_SCRIPT_REQUEST_TEMPLATE = """
+Script request:
+- Scenario: {scenario}
+- Title: {title}
+
+Context:
+{pov_context_md}
+- Selected Outcomes:
+{selected_outcomes_text}
+- Custom Instructions: {custom_instructions}
+"""
+
+SALES_SCRIPT_EDIT_TEMPLATE = """
+Script Scenario: {scenario}
+
+Original POV context for reference:
+- Vendor: {vendor_name}
+- Customer: {customer_name}
+- POV Outcomes: {titles}
+
+Current sales script content:
+{current_content}
+
+The user wants you to: {edit_request}
+"""
+
 @app.post("/generate-sales-script/{report_id}")
 async def generate_sales_script(
     report_id: str,
@@ -3667,63 +3696,31 @@ async def generate_sales_script(
         if not report_data:
             raise HTTPException(status_code=404, detail="Report not found")
 
-        titles_text = "\n".join([f"- {t}" for t in report_data.get('titles', [])])
         selected_outcomes_text = ''
         try:
             source_outcomes = report_data.get('outcomes', []) or []
             if request.selected_outcomes:
-                selected = []
-                for i in request.selected_outcomes:
-                    if 0 <= i < len(source_outcomes):
-                        o = source_outcomes[i]
-                        selected.append(str(o.get('title') if isinstance(o, dict) else o))
-                if selected:
-                    selected_outcomes_text = "\n".join([f"- {t}" for t in selected])
+                selected_outcomes_text = format_bullet_list(
+                    str(source_outcomes[i].get('title') if isinstance(source_outcomes[i], dict) else source_outcomes[i])
+                    for i in request.selected_outcomes if 0 <= i < len(source_outcomes)
+                )
         except Exception:
             selected_outcomes_text = ''
 
-        prompt = f"""
-        You are a sales coach. Write a {request.scenario} sales script titled: {request.title} with the structure and tone below.
-
-        Modelling Considerations
-        Data Sources used in generating the script:
-        - POV Sales Role
-        - POV CEO Role
-        - Sales Rubric
-        - Grok (web research, if available)
-
-        Context:
-        - Vendor: {report_data['report']['vendor_name']}
-        - Services: {report_data['report']['vendor_services']}
-        - Customer: {report_data['report']['target_customer_name']}
-        - Roles: {report_data['report'].get('role_names','')}
-        - POV Titles:\n{titles_text}
-        - Selected Outcomes:\n{selected_outcomes_text or '(Use the most relevant POV outcomes/titles)'}
-        - Custom Instructions: {request.custom_instructions or 'None'}
-
-        Output format (use these exact sections and casing):
-        Sales Script Version 1
-        {request.title}
-        TARGET AUDIENCE: derive from roles and buyer context
-        SPEAKER: {report_data['report']['vendor_name']} sales consultant
-        ESTIMATED DURATION: 60–120 seconds
-        WORD COUNT: 150–220 words
-
-        Then provide the script content using bracketed cues like [PAUSE], [EMPHASIS] where impactful.
-
-        After the script, include:
-        KEY TALKING POINTS FOR REFERENCE:
-        - Primary pain point: one sentence
-        - Core outcome promised: one sentence
-        - Main differentiator: one sentence
-        - Success metric mentioned: one sentence (tie to POV evidence when possible)
-
-        Tone:
-        - Credible, specific, and outcome-driven. Avoid generic claims.
-        - Use concrete examples aligned to the POV when helpful.
-        """
-        from llm import call_gpt
-        script, _ = call_gpt(prompt=prompt, system_prompt="You are a sales coach writing practical scripts.")
+        # Static instructions go first (SALES_SCRIPT_PROMPT_PREFIX) so the provider can cache them;
+        # everything request-specific follows
+        prompt = SALES_SCRIPT_REQUEST_TEMPLATE.format_map({
+            "scenario": request.scenario,
+            "title": request.title,
+            "pov_context_md": report_data['pov_context_md'],
+            "selected_outcomes_text": selected_outcomes_text or '(Use the most relevant POV outcomes/titles)',
+            "custom_instructions": request.custom_instructions or 'None',
+        })
+        script, _ = await acall_gpt(
+            prompt=prompt,
+            system_prompt="You are a sales coach writing practical scripts.",
+            cached_prefix=SALES_SCRIPT_PROMPT_PREFIX
+        )
 
         item = {
             "report_id": report_id,
@@ -3732,7 +3729,8 @@ async def generate_sales_script(
             "title": request.title,
             "script_body": script,
         }
-        result = supabase.table("sales_scripts").insert(item).execute()
+        db = await get_async_supabase()
+        result = await db.table("sales_scripts").insert(item).execute()
         saved = result.data[0] if result.data else item
         return {"message": "Sales script generated", "id": saved.get("id"), "item": saved}
     except Exception as e:
@@ -3741,7 +3739,8 @@ async def generate_sales_script(
 @app.get("/sales-scripts/{report_id}")
 async def get_sales_scripts(report_id: str, user_id: str, api_key: str = Depends(verify_api_key)):
     try:
-        res = supabase.table("sales_scripts").select("*").eq("report_id", report_id).eq("user_id", user_id).order("created_at", desc=True).execute()
+        db = await get_async_supabase()
+        res = await db.table("sales_scripts").select("*").eq("report_id", report_id).eq("user_id", user_id).order("created_at", desc=True).execute()
         return {"items": res.data or []}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -3749,95 +3748,86 @@ async def get_sales_scripts(report_id: str, user_id: str, api_key: str = Depends
 @app.post("/chat-edit-sales-script/{script_id}")
 async def chat_edit_sales_script(
     script_id: str,
-    request: dict,
+    request: ChatEditRequest,
+    background_tasks: BackgroundTasks,
     api_key: str = Depends(verify_api_key)
 ):
     """
     Chat-based sales script editing endpoint with version history
     """
     try:
-        user_id = request.get("user_id")
-        edit_request = request.get("message", "")
-        current_content = request.get("current_content", "")
+        user_id = request.user_id
+        edit_request = request.message
+        current_content = request.current_content
         
         if not edit_request.strip():
             raise HTTPException(status_code=400, detail="Edit request is required")
         
-        # Get original script data including version history
-        script_result = supabase.table("sales_scripts").select("*").eq("id", script_id).eq("user_id", user_id).single().execute()
-        if not script_result.data:
-            raise HTTPException(status_code=404, detail="Sales script not found")
+        # Only the columns the prompt and the version snapshot need
+        script_columns = "id, script_body, title, scenario, report_id, current_version, created_at, updated_at"
         
-        script = script_result.data
-        report_data = await get_pov_report_data(script["report_id"], user_id)
+        # When the client tells us the report up front, fetch the script and POV data concurrently
+        report_id = request.report_id
+        if report_id:
+            script, report_data = await asyncio.gather(sales_scripts.get(script_id, user_id, script_columns), get_pov_report_data(report_id, user_id))
+        else:
+            script, report_data = await sales_scripts.get(script_id, user_id, script_columns), None
+        if report_data is None or script["report_id"] != report_id:
+            report_data = await get_pov_report_data(script["report_id"], user_id)
         
-        # Get current version history and version number
-        version_history = script.get("version_history", [])
-        current_version_num = script.get("current_version", 1)
+        # The stored script is canonical; clients only need to send content for unsaved inline edits
+        if not current_content.strip():
+            current_content = script["script_body"]
         
-        # Save current version to history before updating
-        # For the first edit, save the original as version 1
-        if current_version_num == 1 and len(version_history) == 0:
-            original_entry = {
-                "version": 1,
-                "content": script["script_body"],
-                "title": script["title"],
-                "edited_at": script.get("created_at", datetime.now().isoformat()),
-                "edit_message": "Original version",
-                "edited_by": user_id
-            }
-            version_history.append(original_entry)
-        
-        # Build chat editing prompt
-        prompt = f"""
-        You are an expert editor helping to improve a sales script. The user wants you to: {edit_request}
-
-        Current sales script content:
-        {current_content}
-
-        Script Scenario: {script.get('scenario', 'general')}
-        
-        Original POV context for reference:
-        - Vendor: {report_data['report']['vendor_name']}
-        - Customer: {report_data['report']['target_customer_name']}
-        - POV Outcomes: {', '.join(report_data.get('titles', [])[:5])}
+        # Build chat editing prompt - static rubric first (SALES_SCRIPT_EDIT_PREFIX), request-specific content last
+        edit_context = SALES_SCRIPT_EDIT_TEMPLATE.format_map({
+            "scenario": script.get('scenario') or 'general',
+            "vendor_name": report_data['report']['vendor_name'],
+            "customer_name": report_data['report']['target_customer_name'],
+            "titles": ', '.join(report_data.get('titles', [])[:5]),
+            "current_content": current_content,
+            "edit_request": edit_request,
+        })
+        prompt = edit_context + "\nUpdated script:\n"
         
-        Instructions:
-        - Make the requested changes while maintaining conversational and professional tone
-        - Keep the script appropriate for the scenario type ({script.get('scenario', 'general')})
-        - Ensure changes are relevant to the POV context
-        - Return the complete updated sales script content
-        - Preserve dialogue formatting and speaker indicators
+        async def save_edit(updated_content: str) -> dict:
+            # The guarded row update is awaited so the returned version is real; the history snapshot is written after the response
+            new_version = await sales_scripts.edit(script, script_id, user_id, updated_content, edit_request, background_tasks)
+            return {
+                "message": "Sales script updated successfully",
+                "updated_content": updated_content,
+                "edit_request": edit_request,
+                "version": new_version
+            }
         
-        Updated script:
-        """
+        system_prompt = "You are a professional sales script editor. Make precise, persuasive improvements based on user requests."
+        if request.stream:
+            return stream_llm_response(prompt, system_prompt, save_edit, cached_prefix=SALES_SCRIPT_EDIT_PREFIX)
+        
+        # Long scripts: ask for find/replace patches so output tokens don't grow with the script
+        # Tokens never outnumber characters in practice, so short scripts skip tokenizing; longer ones are encoded off the event loop
+        if len(current_content) > PATCH_EDIT_MIN_TOKENS and await asyncio.to_thread(count_tokens, current_content) > PATCH_EDIT_MIN_TOKENS:
+            patch_response, _ = await acall_gpt(
+                prompt=edit_context + PATCH_EDIT_INSTRUCTIONS,
+                system_prompt=system_prompt,
+                format="json_object",
+                cached_prefix=SALES_SCRIPT_EDIT_PREFIX
+            )
+            patched_content = apply_replacements(current_content, patch_response)
+            if patched_content is not None:
+                return await save_edit(patched_content)
+            print("⚠️ Patch edit could not be applied, falling back to a full rewrite")
         
-        from llm import call_gpt
-        updated_content, _ = call_gpt(
+        updated_content, _ = await acall_gpt(
             prompt=prompt,
-            system_prompt="You are a professional sales script editor. Make precise, persuasive improvements based on user requests.",
+            system_prompt=system_prompt,
+            cached_prefix=SALES_SCRIPT_EDIT_PREFIX
         )
+        return await save_edit(updated_content)
         
-        # Keep only last 20 versions to prevent excessive storage
-        if len(version_history) > 20:
-            version_history = version_history[-20:]
-        
-        # Update the script with new content and version history
-        supabase.table("sales_scripts").update({
-            "script_body": updated_content,
-            "version_history": version_history,
-            "current_version": current_version_num + 1,
-            "updated_at": datetime.now().isoformat()
-        }).eq("id", script_id).eq("user_id", user_id).execute()
-        
-        return {
-            "message": "Sales script updated successfully",
-            "updated_content": updated_content,
-            "edit_request": edit_request,
-            "version": current_version_num + 1,
-            "version_history": version_history
-        }
-        
+    except HTTPException:
+        # e.g. 409 from a concurrent edit of the same document
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -3851,15 +3841,22 @@ async def get_sales_script_versions(
     Get version history for a sales script
     """
     try:
-        result = supabase.table("sales_scripts").select("version_history, current_version, title").eq("id", script_id).eq("user_id", user_id).single().execute()
-        if not result.data:
-            raise HTTPException(status_code=404, detail="Sales script not found")
-        
-        return {
-            "current_version": result.data.get("current_version", 1),
-            "current_title": result.data.get("title", ""),
-            "versions": result.data.get("version_history", [])
-        }
+        return await sales_scripts.list_versions(script_id, user_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/sales-scripts/{script_id}/versions/{version_number}/content")
+async def get_sales_script_version_content(
+    script_id: str,
+    version_number: int,
+    user_id: str,
+    api_key: str = Depends(verify_api_key)
+):
+    """
+    Get the full content of one sales script version (the versions list only returns metadata)
+    """
+    try:
+        return await sales_scripts.get_version_content(script_id, user_id, version_number)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -3867,64 +3864,37 @@ async def get_sales_script_versions(
 async def restore_sales_script_version(
     script_id: str,
     version_number: int,
-    request: dict,
+    request: RestoreRequest,
     api_key: str = Depends(verify_api_key)
 ):
     """
     Restore a previous version of a sales script
     """
     try:
-        user_id = request.get("user_id")
-        
-        # Get script with version history
-        result = supabase.table("sales_scripts").select("*").eq("id", script_id).eq("user_id", user_id).single().execute()
-        if not result.data:
-            raise HTTPException(status_code=404, detail="Sales script not found")
-        
-        script = result.data
-        version_history = script.get("version_history", [])
-        current_version_num = script.get("current_version", 1)
-        
-        # Find the version to restore
-        version_to_restore = None
-        for version in version_history:
-            if version.get("version") == version_number:
-                version_to_restore = version
-                break
-        
-        if not version_to_restore:
-            raise HTTPException(status_code=404, detail=f"Version {version_number} not found")
-        
-        # Save current version to history before restoring
-        current_entry = {
-            "version": current_version_num,
-            "content": script["script_body"],
-            "title": script["title"],
-            "edited_at": script.get("updated_at", script.get("created_at")),
-            "edit_message": f"Before restoring to version {version_number}",
-            "edited_by": user_id
-        }
-        version_history.append(current_entry)
-        
-        # Keep only last 20 versions
-        if len(version_history) > 20:
-            version_history = version_history[-20:]
-        
-        # Restore the selected version
-        supabase.table("sales_scripts").update({
-            "script_body": version_to_restore["content"],
-            "title": version_to_restore.get("title", script["title"]),
-            "version_history": version_history,
-            "current_version": current_version_num + 1,
-            "updated_at": datetime.now().isoformat()
-        }).eq("id", script_id).eq("user_id", user_id).execute()
+        return await sales_scripts.restore(script_id, request.user_id, version_number)
         
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ===============================
+# REPORT ASSETS
+# ===============================
+@app.get("/report/{report_id}/assets")
+async def get_report_assets(report_id: str, user_id: str, api_key: str = Depends(verify_api_key)):
+    """
+    Whitepapers, marketing assets and sales scripts for a report in one round trip
+    """
+    try:
+        db = await get_async_supabase()
+        whitepapers_res, marketing_res, scripts_res = await asyncio.gather(*[
+            db.table(table).select("*").eq("report_id", report_id).eq("user_id", user_id).order("created_at", desc=True).execute()
+            for table in ("whitepapers", "marketing_assets", "sales_scripts")
+        ])
         return {
-            "message": f"Successfully restored version {version_number}",
-            "restored_content": version_to_restore["content"],
-            "new_version": current_version_num + 1
+            "whitepapers": whitepapers_res.data or [],
+            "marketing_assets": marketing_res.data or [],
+            "sales_scripts": scripts_res.data or []
         }
-        
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -3937,24 +3907,18 @@ async def get_company_financial_data(
     Get financial/stock data for a company
     """
     try:
-        from financial_service import get_company_financial_data
-        
-        # Decode the company name from URL encoding
-        import urllib.parse
-        decoded_company_name = urllib.parse.unquote(company_name)
-        
-        # Fetch financial data
-        financial_data = await get_company_financial_data(decoded_company_name)
+        # company_name is already URL-decoded by FastAPI's path parameter handling
+        financial_data = await fetch_company_financial_data(company_name)
         
         if financial_data:
             return {
-                "company_name": decoded_company_name,
+                "company_name": company_name,
                 "financial_data": financial_data,
                 "is_public": True
             }
         else:
             return {
-                "company_name": decoded_company_name,
+                "company_name": company_name,
                 "financial_data": None,
                 "is_public": False,
                 "message": "No financial data found - likely a private company or ticker not recognized"
@@ -3967,30 +3931,28 @@ async def get_company_financial_data(
 async def health_check():
     return {"status": "healthy"}
 
-@app.get("/cleanup")
-async def cleanup_temp_files():
-    """Cleanup temporary files older than 1 hour"""
-    import time
-    current_time = time.time()
+def remove_stale_temp_files(max_age_seconds: int = 3600) -> int:
+    """Delete files in temp/ older than max_age_seconds, returning how many were removed"""
+    cutoff = time.time() - max_age_seconds
     cleaned = 0
     
-    for filename in os.listdir("temp"):
-        filepath = os.path.join("temp", filename)
-        try:
-            # Get file's last modification time
-            file_time = os.path.getmtime(filepath)
-            # If file is older than 1 hour
-            if current_time - file_time > 3600:
-                os.remove(filepath)
-                cleaned += 1
-        except OSError:
-            continue
-            
-    return {"message": f"Cleaned up {cleaned} old temporary files"}
+    # scandir entries carry the directory listing's stat info, so there's no extra stat per file on most filesystems
+    with os.scandir("temp") as entries:
+        for entry in entries:
+            try:
+                if entry.is_file(follow_symlinks=False) and entry.stat(follow_symlinks=False).st_mtime < cutoff:
+                    os.unlink(entry.path)
+                    cleaned += 1
+            except OSError:
+                continue
+    
+    return cleaned
 
 @app.get("/cleanup")
-async def cleanup():
-    return {"message": "Cleanup endpoint"}
+async def cleanup_temp_files():
+    """Cleanup temporary files older than 1 hour"""
+    cleaned = await asyncio.to_thread(remove_stale_temp_files)
+    return {"message": f"Cleaned up {cleaned} old temporary files"}
 
 @app.post("/admin/sync-report-counters")
 async def sync_report_counters(
@@ -4008,45 +3970,43 @@ async def sync_report_counters(
         
         print("🔄 Starting report counter synchronization...")
         
-        # Get all users
-        users_result = supabase.table("profiles").select("id, email, full_name, reports_generated_total").execute()
-        users = users_result.data
+        db = await get_async_supabase()
         
-        sync_results = []
-        total_synced = 0
+        # Only users whose stored counter is wrong come back, plus a head-only count of all users
+        diffs_result, users_result = await asyncio.gather(
+            db.rpc("report_counter_diffs").execute(),
+            db.table("profiles").select("id", count="exact", head=True).execute()
+        )
         
-        for user in users:
-            user_id = user["id"]
-            current_quota_count = user.get("reports_generated_total", 0) or 0
-            
-            # Get actual report count from pov_reports table
-            reports_result = supabase.table("pov_reports").select("id", count="exact").eq("user_id", user_id).execute()
-            actual_report_count = reports_result.count or 0
+        sync_results = []
+        for row in diffs_result.data or []:
+            current_quota_count = row.get("stored") or 0
+            actual_report_count = row["actual"]
+            print(f"👤 {row.get('email') or row['id']}: {current_quota_count} → {actual_report_count}")
             
-            # If there's a discrepancy, update the counter
-            if actual_report_count != current_quota_count:
-                print(f"👤 {user.get('email', user_id)}: {current_quota_count} → {actual_report_count}")
-                
-                # Update the quota counters to match actual report count
-                update_result = supabase.table("profiles").update({
-                    "reports_generated_total": actual_report_count,
-                    "updated_at": datetime.now().isoformat()
-                }).eq("id", user_id).execute()
-                
-                sync_results.append({
-                    "user_id": user_id,
-                    "email": user.get("email", "N/A"),
-                    "old_count": current_quota_count,
-                    "new_count": actual_report_count,
-                    "difference": actual_report_count - current_quota_count
-                })
-                total_synced += 1
+            sync_results.append({
+                "user_id": row["id"],
+                "email": row.get("email") or "N/A",
+                "old_count": current_quota_count,
+                "new_count": actual_report_count,
+                "difference": actual_report_count - current_quota_count
+            })
+        total_synced = len(sync_results)
+        
+        # Update all mismatched quota counters in one statement
+        if sync_results:
+            await db.rpc("set_report_counters", {
+                "counters": [
+                    {"id": result["user_id"], "reports_generated_total": result["new_count"]}
+                    for result in sync_results
+                ]
+            }).execute()
         
         print(f"✅ Synchronization complete. {total_synced} users updated.")
         
         return {
             "message": f"Report counters synchronized for {total_synced} users",
-            "total_users_checked": len(users),
+            "total_users_checked": users_result.count or 0,
             "users_synced": total_synced,
             "sync_details": sync_results
         }
@@ -4061,10 +4021,21 @@ async def sync_report_counters(
         )
 
 # Add this block to run the server directly with `python main.py`
+# ENV=production runs multiple workers on uvloop/httptools instead of the single reloading dev server
 if __name__ == "__main__":
-    uvicorn.run(
-        "main:app", 
-        host="127.0.0.1", 
-        port=8081, 
-        reload=True # Enable reload for development convenience
-    ) 
\ No newline at end of file
+    if os.getenv("ENV", "dev") == "dev":
+        uvicorn.run(
+            "main:app", 
+            host="127.0.0.1", 
+            port=8081, 
+            reload=True # Enable reload for development convenience
+        )
+    else:
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=int(os.getenv("PORT", "8081")),
+            workers=int(os.getenv("WORKERS", "1")),
+            loop="uvloop",
+            http="httptools"
+        ) 
\ No newline at end of file
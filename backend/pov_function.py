@@ -1,25 +1,75 @@
 import json
 import os
+import re
+import traceback
 from typing import Dict, List, Optional
+from dataclasses import asdict, dataclass, field, fields
 import datetime
 import asyncio
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from file_upload import FileReader
 import uuid
+import orjson
 
 # These imports assume you have real implementations of these functions
 from internet_research_functions import crawl_and_analyze_company_website
 from llm import (
-    llm_call,
     call_gpt, 
     llm_01, 
     llm_01_async,
     generate_outcome_titles_prompt, 
     generate_single_outcome_detail_prompt,
+    generate_batched_outcome_details_prompt,
     generate_summary_takeaways_prompt
 )
-from fetch_linkedin_profiles import fetch_profiles_in_threads
+from fetch_linkedin_profiles import fetch_profiles_async
+from llm_cache import cached_llm_call, content_hash
 
+# Shared pool for the blocking context-gathering work (crawls, file reads, report writes)
+_EXECUTOR = ThreadPoolExecutor(max_workers=32, thread_name_prefix="pov-io")
+
+# Upper bounds so a hung crawl, fetch or LLM request can't stall a report indefinitely.
+# A timed-out crawl's pool thread still runs to completion; only the wait is abandoned.
+CONTEXT_TASK_TIMEOUT_SECONDS = 90
+LLM_STEP_TIMEOUT_SECONDS = 240
+
+# Outcome details are generated this many titles per LLM call, so the background context is sent once per batch
+DETAIL_BATCH_SIZE = 3
+DETAIL_TOKENS_PER_OUTCOME = 4000
+
+# Research blobs longer than this are cut off in the background context
+MAX_CONTEXT_SECTION_CHARS = 50_000
+
+# Rendered background contexts for Step 2 of the selective workflow, keyed by
+# (report_id, user_id, hash of the Grok block)
+MAX_CACHED_BACKGROUND_CONTEXTS = 128
+_background_contexts: "OrderedDict[tuple, str]" = OrderedDict()
+
+# First JSON array in a titles response, ignoring code fences or prose around it
+_JSON_ARRAY_RE = re.compile(r"\[.*\]", re.DOTALL)
+
+
+def context_json(data) -> str:
+    """
+    Serialize research data for the background context. orjson's compact, raw UTF-8
+    output keeps the prompt (and its token count) smaller than pretty-printed JSON.
+    """
+    return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+def as_context_str(label: str, data, empty: str = "Not available") -> str:
+    """
+    One "label: json" line of the background context. Empty data short-circuits to the
+    placeholder and oversized blobs are truncated to MAX_CONTEXT_SECTION_CHARS.
+    """
+    if not data:
+        return f"{label}: {empty}"
+    serialized = context_json(data)
+    if len(serialized) > MAX_CONTEXT_SECTION_CHARS:
+        serialized = serialized[:MAX_CONTEXT_SECTION_CHARS] + " ...[truncated]"
+    return f"{label}: {serialized}"
 
 
 async def process_research(url: str, research_type: str) -> Dict:
@@ -29,76 +79,268 @@ async def process_research(url: str, research_type: str) -> Dict:
     if not url or not url.strip():
         return {"status": "skipped", "reason": f"No {research_type} URL provided"}
     
+    # Run the CPU-bound crawl operation in a thread pool; errors propagate to the caller's gather()
+    result = await asyncio.get_running_loop().run_in_executor(_EXECUTOR, crawl_and_analyze_company_website, url)
+    return {"status": "success", "data": result}
+
+@lru_cache(maxsize=128)
+def _read_file_cached(file_path: str, mtime_ns: int, size: int) -> Dict:
+    """
+    FileReader.read_file keyed on the file's modification time and size as well as its path,
+    so regenerating a POV against the same upload skips re-parsing it
+    """
+    return FileReader.read_file(file_path)
+
+
+def _read_file(file_path: str) -> Optional[Dict]:
+    """Stat and read a file in one executor hop. Returns None if the file doesn't exist."""
     try:
-        # Run the CPU-bound crawl operation in a thread pool
-        loop = asyncio.get_event_loop()
-        with ThreadPoolExecutor() as pool:
-            result = await loop.run_in_executor(
-                pool, 
-                crawl_and_analyze_company_website, 
-                url
-            )
-        return {"status": "success", "data": result}
-    except Exception as e:
-        return {
-            "status": "error",
-            "reason": f"Error analyzing {research_type}: {str(e)}"
-        }
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return _read_file_cached(file_path, stat.st_mtime_ns, stat.st_size)
+
 
 async def process_file_content(file_path: str) -> Dict:
     """
     Asynchronously process file content using FileReader
     """
-    if not file_path or not os.path.exists(file_path):
+    if not file_path:
         return {"status": "skipped", "reason": "File not provided or doesn't exist"}
     
-    try:
-        # Run the file reading operation in a thread pool
-        loop = asyncio.get_event_loop()
-        with ThreadPoolExecutor() as pool:
-            result = await loop.run_in_executor(
-                pool,
-                FileReader.read_file,
-                file_path
-            )
-        return {"status": "success", "data": result}
-    except Exception as e:
-        return {
-            "status": "error",
-            "reason": f"Error processing file: {str(e)}"
-        }
+    # Run the existence check and the file reading in the thread pool so no filesystem call blocks the loop
+    result = await asyncio.get_running_loop().run_in_executor(_EXECUTOR, _read_file, file_path)
+    if result is None:
+        return {"status": "skipped", "reason": "File not provided or doesn't exist"}
+    return {"status": "success", "data": result}
 
 async def process_linkedin_profiles(linkedin_urls_text: Optional[str]) -> Dict:
     """
     Asynchronously process LinkedIn profile fetching for given URLs text.
-    Runs the synchronous fetch_profiles_in_threads in a thread pool.
+    Profiles are fetched on the event loop, so no pool thread is used.
     """
     if not linkedin_urls_text or not linkedin_urls_text.strip():
         return {"status": "skipped", "reason": "No LinkedIn URLs provided"}
 
+    print(f"Processing LinkedIn profiles for URLs: {linkedin_urls_text}")
+    # fetch_profiles_async expects the raw text containing URLs
+    result = await fetch_profiles_async(linkedin_urls_text)
+    print(f"LinkedIn profiles fetched: {result}")
+    return {"status": "success", "data": result}
+
+
+@dataclass
+class ContextBundle:
+    """
+    Everything gathered in Step 0 of POV generation. Stored as the report's context_data
+    (alongside the rendered background_context) so Step 2 of the selective workflow
+    doesn't gather it again.
+    """
+    vendor_research: Optional[Dict] = None
+    customer_research: Optional[Dict] = None
+    vendor_file_content: List[Dict] = field(default_factory=list)
+    customer_file_content: List[Dict] = field(default_factory=list)
+    linkedin_profiles_data: Optional[Dict] = None
+
+    @classmethod
+    def from_context_data(cls, context_data: Dict) -> "ContextBundle":
+        return cls(**{f.name: context_data[f.name] for f in fields(cls) if context_data.get(f.name) is not None})
+
+
+async def gather_context(
+    vendor_url: str,
+    target_customer_url: str,
+    vendor_files: Optional[List[str]],
+    customer_files: Optional[List[str]],
+    linkedin_urls: Optional[str]
+) -> ContextBundle:
+    """
+    Run the research, document and LinkedIn tasks concurrently, each bounded by CONTEXT_TASK_TIMEOUT_SECONDS.
+    A failed or timed-out task is logged with its traceback and leaves its part of the bundle empty.
+    """
+    tasks = [
+        ("vendor_research", process_research(vendor_url, "vendor")),
+        ("customer_research", process_research(target_customer_url, "customer")),
+        *[("vendor_file", process_file_content(f)) for f in vendor_files or []],
+        *[("customer_file", process_file_content(f)) for f in customer_files or []],
+    ]
+    if linkedin_urls:
+        tasks.append(("linkedin_profiles_data", process_linkedin_profiles(linkedin_urls)))
+
+    results = await asyncio.gather(
+        *(asyncio.wait_for(coro, CONTEXT_TASK_TIMEOUT_SECONDS) for _, coro in tasks),
+        return_exceptions=True
+    )
+
+    context = ContextBundle()
+    for (kind, _), result in zip(tasks, results):
+        if isinstance(result, Exception):
+            print(f"⚠️ Context gathering task {kind} failed: {result!r}")
+            traceback.print_exception(type(result), result, result.__traceback__)
+        elif result["status"] == "success":
+            if kind == "vendor_file":
+                context.vendor_file_content.append(result["data"])
+            elif kind == "customer_file":
+                context.customer_file_content.append(result["data"])
+            else:
+                setattr(context, kind, result["data"])
+    return context
+
+
+def _build_grok_block(grok_research: Optional[Dict]) -> str:
+    """Grok research section appended to the background context, or "" when there is none"""
+    if grok_research and grok_research.get("pov_context_block"):
+        return f"\n\nGrok Enhanced Research:\n{grok_research['pov_context_block']}"
+    return ""
+
+
+def build_background_context(context: ContextBundle, grok_research: Optional[Dict] = None, **meta) -> str:
+    """
+    Render the background context shared by every POV prompt.
+    meta is the request fields (vendor_name=..., role_names=...), listed in the order given.
+    """
+    extra_context = _build_grok_block(grok_research)
+    meta_lines = "\n".join(f"{key}: {value}" for key, value in meta.items())
+    return f"""
+{meta_lines}
+
+{as_context_str("Vendor Research", context.vendor_research)}
+{as_context_str("Customer Research", context.customer_research)}
+
+{as_context_str("Vendor Document Analysis", context.vendor_file_content, "No documents provided")}
+{as_context_str("Customer Document Analysis", context.customer_file_content, "No documents provided")}
+
+LinkedIn Profiles Analysis: {context.linkedin_profiles_data if context.linkedin_profiles_data else "Not available or not requested"}{extra_context}
+"""
+
+
+def parse_outcome_titles(response: Optional[str]):
+    """
+    Parse the JSON list out of a generate_outcome_titles_prompt response.
+    Raises ValueError (json.JSONDecodeError when the array itself is malformed).
+    """
+    match = _JSON_ARRAY_RE.search(response or "")
+    if not match:
+        raise ValueError("No JSON list found in the titles response.")
+    return orjson.loads(match.group(0))
+
+
+async def llm_step(instructions: List[str], model_name: str, **kwargs):
+    """
+    cached_llm_call() bounded by LLM_STEP_TIMEOUT_SECONDS. The pending requests are
+    cancelled on timeout and a TimeoutError is raised.
+    """
     try:
-        print(f"Processing LinkedIn profiles for URLs: {linkedin_urls_text}")
-        # Run the potentially blocking operation in a thread pool
-        loop = asyncio.get_event_loop()
-        with ThreadPoolExecutor() as pool:
-            # fetch_profiles_in_threads expects the raw text containing URLs
-            result = await loop.run_in_executor(
-                pool,
-                fetch_profiles_in_threads,
-                linkedin_urls_text
-            )
-        print(f"LinkedIn profiles fetched: {result}")
-        return {"status": "success", "data": result}
+        return await asyncio.wait_for(
+            cached_llm_call(instructions=instructions, model=model_name, **kwargs), LLM_STEP_TIMEOUT_SECONDS
+        )
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"LLM call timed out after {LLM_STEP_TIMEOUT_SECONDS}s")
+
+
+def _parse_batched_details(response: Optional[str], expected: int) -> Optional[List[str]]:
+    """
+    Extract the per-outcome markdown from a generate_batched_outcome_details_prompt response.
+    Returns None unless it holds exactly `expected` non-empty sections.
+    """
+    try:
+        sections = orjson.loads(response)["outcomes"]
+    except (ValueError, KeyError, TypeError):
+        return None
+    if not isinstance(sections, list) or len(sections) != expected:
+        return None
+    if not all(isinstance(section, str) and section.strip() for section in sections):
+        return None
+    return [section.strip() for section in sections]
+
+
+async def generate_outcome_details(
+    background_context: str,
+    outcome_titles: List[str],
+    vendor_name: str,
+    target_customer_name: str,
+    role_names: str,
+    model_name: str,
+    batch_size: int = DETAIL_BATCH_SIZE
+) -> List[str]:
+    """
+    Generate the detailed markdown for each outcome title, batch_size titles per LLM call.
+    Titles from batches whose response can't be split into one section per title are
+    regenerated with one prompt each.
+    """
+    batches = [outcome_titles[i:i + batch_size] for i in range(0, len(outcome_titles), batch_size)]
+    batched_prompts = [
+        generate_batched_outcome_details_prompt(background_context, batch, vendor_name, target_customer_name, role_names)
+        for batch in batches
+    ]
+    batch_responses, _ = await llm_step(
+        batched_prompts,
+        model_name,
+        response_format='json_object',
+        max_completion_tokens=DETAIL_TOKENS_PER_OUTCOME * batch_size
+    )
+
+    outcome_details: List[Optional[str]] = [None] * len(outcome_titles)
+    for batch_index, (batch, response) in enumerate(zip(batches, batch_responses)):
+        sections = _parse_batched_details(response, len(batch))
+        if sections:
+            start = batch_index * batch_size
+            outcome_details[start:start + len(sections)] = sections
+
+    missing = [i for i, detail in enumerate(outcome_details) if detail is None]
+    if missing:
+        print(f"⚠️ Batched outcome details unusable for {len(missing)} titles, generating them one by one")
+        single_prompts = [
+            generate_single_outcome_detail_prompt(background_context, outcome_titles[i], vendor_name, target_customer_name, role_names)
+            for i in missing
+        ]
+        single_responses, _ = await llm_step(single_prompts, model_name)
+        for i, detail in zip(missing, single_responses):
+            outcome_details[i] = detail
+
+    return outcome_details
+
+
+async def generate_summary_takeaways(
+    background_context: str,
+    vendor_name: str,
+    target_customer_name: str,
+    role_names: str,
+    model_name: str,
+    num_outcomes: int = 15,
+    outcomes_label: str = "Outcomes"
+) -> str:
+    """
+    Generate the summary & takeaways markdown. It only needs the background context, so callers
+    start it alongside the titles/details instead of after them. Failures are returned as
+    placeholder sections rather than raised.
+    """
+    heading = f"## **Summary & Strategic Integration of All {num_outcomes} {outcomes_label}**"
+    try:
+        summary_prompt = generate_summary_takeaways_prompt(
+            background_context, vendor_name, target_customer_name, role_names, num_outcomes
+        )
+        summary_responses, _ = await llm_step([summary_prompt], model_name)
+        if summary_responses and summary_responses[0]:
+            return summary_responses[0]
+        print("⚠️ Warning: LLM did not return summary/takeaways content.")
+        return f"\n{heading}\n\n*Error: Failed to generate Summary & Strategic Integration.*\n\n---\n\n## **Key Takeaways & Next Steps**\n\n*Error: Failed to generate Key Takeaways & Next Steps.*"
     except Exception as e:
-        # Log the error appropriately if needed
-        return {
-            "status": "error",
-            "reason": f"Error fetching LinkedIn profiles: {str(e)}"
-        }
+        print(f"❌ Error generating summary and takeaways: {e}")
+        return f"\n{heading}\n\n*Error generating Summary & Strategic Integration: {e}*\n\n---\n\n## **Key Takeaways & Next Steps**\n\n*Error generating Key Takeaways & Next Steps: {e}*"
+
 
+def _write_bytes(path: str, data: bytes) -> None:
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
 
 
-def format_pov_as_markdown(pov_data: str, output_file: str) -> str:
+async def format_pov_as_markdown(pov_data: str, output_file: str) -> str:
     """
     Saves the POV analysis as a markdown file
     
@@ -109,8 +351,8 @@ def format_pov_as_markdown(pov_data: str, output_file: str) -> str:
     Returns:
         The path to the saved markdown file
     """
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(pov_data)
+    # Encode once and write from the shared pool so a slow volume doesn't stall the event loop
+    await asyncio.get_running_loop().run_in_executor(_EXECUTOR, _write_bytes, output_file, pov_data.encode("utf-8"))
     
     return output_file
 
@@ -174,74 +416,35 @@ async def generate_pov_analysis_parallel(
 ) -> str:
     """
     Generates POV analysis data in markdown format using a parallel approach.
-    1. Generates 15 outcome titles.
+    1. Generates 15 outcome titles, with the final summary and takeaways running alongside.
     2. Generates detailed analysis for each outcome in parallel.
-    3. Generates final summary and takeaways.
-    4. Assembles the final report.
+    3. Assembles the final report.
     Returns markdown text.
     """
     print("Starting parallel POV generation...")
     # --- Step 0: Gather Context (Same as original function) ---
-    tasks = [
-        process_research(vendor_url, "vendor"),
-        process_research(target_customer_url, "customer")
-    ]
-    vendor_research_idx = 0
-    customer_research_idx = 1
-    vendor_files_start_idx = 2
-    if vendor_files:
-        tasks.extend([process_file_content(f) for f in vendor_files])
-    customer_files_start_idx = len(tasks)
-    if customer_files:
-        tasks.extend([process_file_content(f) for f in customer_files])
-    linkedin_profiles_idx = -1
-    if linkedin_urls:
-        linkedin_profiles_idx = len(tasks)
-        tasks.append(process_linkedin_profiles(linkedin_urls))
-
-    results = await asyncio.gather(*tasks)
-
-    vendor_research = None
-    customer_research = None
-    vendor_file_content = []
-    customer_file_content = []
-    linkedin_profiles_data = None
-
-    for i, result in enumerate(results):
-        if result["status"] == "success":
-            if i == vendor_research_idx:
-                vendor_research = result["data"]
-            elif i == customer_research_idx:
-                customer_research = result["data"]
-            elif vendor_files_start_idx <= i < customer_files_start_idx:
-                vendor_file_content.append(result["data"])
-            elif customer_files_start_idx <= i < (linkedin_profiles_idx if linkedin_profiles_idx != -1 else len(tasks)):
-                customer_file_content.append(result["data"])
-            elif i == linkedin_profiles_idx:
-                linkedin_profiles_data = result["data"]
-        elif result["status"] == "error":
-             print(f"Context gathering task {i} failed: {result.get('reason', 'Unknown error')}")
-
-    background_context = f"""
-vendor_name: {vendor_name}
-vendor_url: {vendor_url}
-vendor_services: {vendor_services}
-target_customer_name: {target_customer_name}
-target_customer_url: {target_customer_url}
-roles_sold_to: {roles_sold_to}
-linkedin_urls: {linkedin_urls}
-role_names: {role_names}
-role_context: {role_context}
-additional_context: {additional_context}
-
-Vendor Research: {json.dumps(vendor_research, indent=2) if vendor_research else "Not available"}
-Customer Research: {json.dumps(customer_research, indent=2) if customer_research else "Not available"}
-
-Vendor Document Analysis: {json.dumps(vendor_file_content, indent=2) if vendor_file_content else "No documents provided"}
-Customer Document Analysis: {json.dumps(customer_file_content, indent=2) if customer_file_content else "No documents provided"}
-
-LinkedIn Profiles Analysis: {linkedin_profiles_data if linkedin_profiles_data else "Not available or not requested"}
-"""
+    context = await gather_context(
+        vendor_url, target_customer_url, vendor_files, customer_files, linkedin_urls
+    )
+
+    background_context = build_background_context(
+        context,
+        vendor_name=vendor_name,
+        vendor_url=vendor_url,
+        vendor_services=vendor_services,
+        target_customer_name=target_customer_name,
+        target_customer_url=target_customer_url,
+        roles_sold_to=roles_sold_to,
+        linkedin_urls=linkedin_urls,
+        role_names=role_names,
+        role_context=role_context,
+        additional_context=additional_context
+    )
+
+    # The summary only depends on the background context, so it runs alongside the titles and details
+    summary_task = asyncio.create_task(generate_summary_takeaways(
+        background_context, vendor_name, target_customer_name, role_names, model_name
+    ))
 
     # --- Step 1: Generate Outcome Titles --- 
     print("Step 1: Generating outcome titles...")
@@ -251,16 +454,14 @@ LinkedIn Profiles Analysis: {linkedin_profiles_data if linkedin_profiles_data el
             background_context, vendor_name, target_customer_name, role_names
         )
         # Use llm_01_async, expecting a single JSON string in the first element of the list
-        title_responses, _ = await llm_call(instructions=[title_prompt], model=model_name)
+        title_responses, _ = await llm_step([title_prompt], model_name)
         
         if not title_responses:
             raise ValueError("LLM did not return any response for outcome titles.")
 
         # Attempt to parse the JSON string response
         try:
-            # Clean potential markdown code fences if present
-            json_string = title_responses[0].strip().strip('`').strip("json\n")
-            outcome_titles = json.loads(json_string)
+            outcome_titles = parse_outcome_titles(title_responses[0])
             if not isinstance(outcome_titles, list):
                 raise ValueError("Parsed JSON is not a list.")
             if len(outcome_titles) < 15:
@@ -284,26 +485,22 @@ LinkedIn Profiles Analysis: {linkedin_profiles_data if linkedin_profiles_data el
 
     except Exception as e:
         print(f"Error generating outcome titles: {e}")
+        summary_task.cancel()
         return f"Error: Failed to generate outcome titles - {e}"
 
     if not outcome_titles:
+        summary_task.cancel()
         return "Error: No outcome titles were generated."
     print(f"Generated {len(outcome_titles)} outcome titles.")
 
     # --- Step 2 & 3: Generate Details for Each Outcome in Parallel ---
     print("Step 2 & 3: Generating details for each outcome...")
-    detail_prompts = []
-    for title in outcome_titles:
-        detail_prompts.append(
-            generate_single_outcome_detail_prompt(
-                background_context, title, vendor_name, target_customer_name, role_names
-            )
-        )
-    
     outcome_details_markdown = []
     try:
-        # Run the 15 detail prompts in parallel
-        outcome_details_markdown, _ = await llm_call(instructions=detail_prompts, model=model_name)
+        # Run the batched detail prompts in parallel
+        outcome_details_markdown = await generate_outcome_details(
+            background_context, outcome_titles, vendor_name, target_customer_name, role_names, model_name
+        )
         if len(outcome_details_markdown) != len(outcome_titles):
              print(f"Warning: Mismatch between requested ({len(outcome_titles)}) and received ({len(outcome_details_markdown)}) outcome details.")
              # Handle mismatch? Maybe use only the ones received?
@@ -312,25 +509,12 @@ LinkedIn Profiles Analysis: {linkedin_profiles_data if linkedin_profiles_data el
     except Exception as e:
         print(f"Error generating outcome details in parallel: {e}")
         # Decide how to proceed - return partial or error?
+        summary_task.cancel()
         return f"Error: Failed during parallel generation of outcome details - {e}"
     print("Finished generating outcome details.")
 
-    # --- Step 4: Generate Summary & Takeaways ---
-    print("Step 4: Generating summary and takeaways...")
-    summary_takeaways_markdown = ""
-    try:
-        summary_prompt = generate_summary_takeaways_prompt(
-            background_context, vendor_name, target_customer_name, role_names
-        )
-        summary_responses, _ = await llm_call(instructions=[summary_prompt], model=model_name)
-        if summary_responses:
-            summary_takeaways_markdown = summary_responses[0]
-        else:
-            print("Warning: LLM did not return summary/takeaways content.")
-            summary_takeaways_markdown = "\n## **Summary & Strategic Integration of All 15 Outcomes**\n\n*Error: Failed to generate Summary & Strategic Integration.*\n\n---\n\n## **Key Takeaways & Next Steps**\n\n*Error: Failed to generate Key Takeaways & Next Steps.*"
-    except Exception as e:
-        print(f"Error generating summary and takeaways: {e}")
-        summary_takeaways_markdown = f"\n## **Summary & Strategic Integration of All 15 Outcomes**\n\n*Error generating Summary & Strategic Integration: {e}*\n\n---\n\n## **Key Takeaways & Next Steps**\n\n*Error generating Key Takeaways & Next Steps: {e}*"
+    # --- Step 4: Collect Summary & Takeaways (started alongside Step 1) ---
+    summary_takeaways_markdown = await summary_task
     print("Finished generating summary and takeaways.")
     
     # --- Step 5: Assemble Final Markdown --- 
@@ -342,37 +526,33 @@ LinkedIn Profiles Analysis: {linkedin_profiles_data if linkedin_profiles_data el
     report_title_md = f"## **POV Report: {vendor_name} {target_customer_name} {role_names} {current_date}**\n\n"
 
     # Create the information header section
-    info_header = f"### **1. Input Information**\n"
-    info_header += f"- **Vendor Name:** {vendor_name}\n"
+    header_lines = ["### **1. Input Information**", f"- **Vendor Name:** {vendor_name}"]
     if vendor_url:
-        info_header += f"- **Vendor URL:** {vendor_url}\n"
-    info_header += f"- **Target Customer:** {target_customer_name}\n"
+        header_lines.append(f"- **Vendor URL:** {vendor_url}")
+    header_lines.append(f"- **Target Customer:** {target_customer_name}")
     if target_customer_url:
-        info_header += f"- **Target Customer URL:** {target_customer_url}\n"
+        header_lines.append(f"- **Target Customer URL:** {target_customer_url}")
     if role_names:
-        info_header += f"- **Role(s) Being Sold To:** {role_names}\n"
+        header_lines.append(f"- **Role(s) Being Sold To:** {role_names}")
     if linkedin_urls:
-        info_header += f"- **LinkedIn URL:** {linkedin_urls}\n"
+        header_lines.append(f"- **LinkedIn URL:** {linkedin_urls}")
     if role_context:
-        info_header += f"- **Role Context:** {role_context}\n"
+        header_lines.append(f"- **Role Context:** {role_context}")
     if additional_context:
-        info_header += f"- **Additional Context:** {additional_context}\n"
-    info_header += "\n---\n\n" # Add separator
-    
-    # Join outcome details with separator
-    all_outcomes_markdown = "\n\n---\n\n".join(outcome_details_markdown)
-
-    # Combine all parts
-    final_markdown = (
-        report_title_md
-        + info_header
-        + all_outcomes_markdown
-        + "\n\n---\n\n" # Separator before summary
-        + summary_takeaways_markdown
-    )
-    
+        header_lines.append(f"- **Additional Context:** {additional_context}")
+
+    # Collect every piece and join once instead of copying the document on each +
+    separator = "\n\n---\n\n"
+    parts = [report_title_md, "\n".join(header_lines), separator]
+    for i, outcome_markdown in enumerate(outcome_details_markdown):
+        if i:
+            parts.append(separator)
+        parts.append(outcome_markdown)
+    parts.append(separator) # Separator before summary
+    parts.append(summary_takeaways_markdown)
+
     print("Finished assembling markdown.")
-    return final_markdown 
+    return "".join(parts)
 
 async def generate_pov_titles_only(
     vendor_name: str,
@@ -398,66 +578,23 @@ async def generate_pov_titles_only(
     
     # --- Step 0: Gather Context (Same as full function) ---
     print("📊 Gathering context...")
-    tasks = [
-        process_research(vendor_url, "vendor"),
-        process_research(target_customer_url, "customer")
-    ]
-    vendor_research_idx = 0
-    customer_research_idx = 1
-    vendor_files_start_idx = 2
-    if vendor_files:
-        tasks.extend([process_file_content(f) for f in vendor_files])
-    customer_files_start_idx = len(tasks)
-    if customer_files:
-        tasks.extend([process_file_content(f) for f in customer_files])
-    linkedin_profiles_idx = -1
-    if linkedin_urls:
-        linkedin_profiles_idx = len(tasks)
-        tasks.append(process_linkedin_profiles(linkedin_urls))
-
-    results = await asyncio.gather(*tasks)
-
-    vendor_research = None
-    customer_research = None
-    vendor_file_content = []
-    customer_file_content = []
-    linkedin_profiles_data = None
-
-    for i, result in enumerate(results):
-        if result["status"] == "success":
-            if i == vendor_research_idx:
-                vendor_research = result["data"]
-            elif i == customer_research_idx:
-                customer_research = result["data"]
-            elif vendor_files_start_idx <= i < customer_files_start_idx:
-                vendor_file_content.append(result["data"])
-            elif customer_files_start_idx <= i < (linkedin_profiles_idx if linkedin_profiles_idx != -1 else len(tasks)):
-                customer_file_content.append(result["data"])
-            elif i == linkedin_profiles_idx:
-                linkedin_profiles_data = result["data"]
-        elif result["status"] == "error":
-             print(f"⚠️ Context gathering task {i} failed: {result.get('reason', 'Unknown error')}")
-
-    background_context = f"""
-vendor_name: {vendor_name}
-vendor_url: {vendor_url}
-vendor_services: {vendor_services}
-target_customer_name: {target_customer_name}
-target_customer_url: {target_customer_url}
-roles_sold_to: {roles_sold_to}
-linkedin_urls: {linkedin_urls}
-role_names: {role_names}
-role_context: {role_context}
-additional_context: {additional_context}
-
-Vendor Research: {json.dumps(vendor_research, indent=2) if vendor_research else "Not available"}
-Customer Research: {json.dumps(customer_research, indent=2) if customer_research else "Not available"}
-
-Vendor Document Analysis: {json.dumps(vendor_file_content, indent=2) if vendor_file_content else "No documents provided"}
-Customer Document Analysis: {json.dumps(customer_file_content, indent=2) if customer_file_content else "No documents provided"}
-
-LinkedIn Profiles Analysis: {linkedin_profiles_data if linkedin_profiles_data else "Not available or not requested"}
-"""
+    context = await gather_context(
+        vendor_url, target_customer_url, vendor_files, customer_files, linkedin_urls
+    )
+
+    background_context = build_background_context(
+        context,
+        vendor_name=vendor_name,
+        vendor_url=vendor_url,
+        vendor_services=vendor_services,
+        target_customer_name=target_customer_name,
+        target_customer_url=target_customer_url,
+        roles_sold_to=roles_sold_to,
+        linkedin_urls=linkedin_urls,
+        role_names=role_names,
+        role_context=role_context,
+        additional_context=additional_context
+    )
 
     # --- Step 1: Generate Outcome Titles Only --- 
     print(f"🎯 Generating {num_outcomes} outcome titles...")
@@ -467,16 +604,14 @@ LinkedIn Profiles Analysis: {linkedin_profiles_data if linkedin_profiles_data el
             background_context, vendor_name, target_customer_name, role_names, num_outcomes
         )
         # Use llm_01_async, expecting a single JSON string in the first element of the list
-        title_responses, _ = await llm_call(instructions=[title_prompt], model=model_name)
+        title_responses, _ = await llm_step([title_prompt], model_name)
         
         if not title_responses:
             raise ValueError("LLM did not return any response for outcome titles.")
 
         # Attempt to parse the JSON string response
         try:
-            # Clean potential markdown code fences if present
-            json_string = title_responses[0].strip().strip('`').strip("json\n")
-            outcome_titles = json.loads(json_string)
+            outcome_titles = parse_outcome_titles(title_responses[0])
             if not isinstance(outcome_titles, list):
                 raise ValueError("Parsed JSON is not a list.")
             if len(outcome_titles) < num_outcomes:
@@ -506,14 +641,7 @@ LinkedIn Profiles Analysis: {linkedin_profiles_data if linkedin_profiles_data el
     # Return both titles and context for saving to database
     return {
         "titles": outcome_titles,
-        "context_data": {
-            "vendor_research": vendor_research,
-            "customer_research": customer_research,
-            "vendor_file_content": vendor_file_content,
-            "customer_file_content": customer_file_content,
-            "linkedin_profiles_data": linkedin_profiles_data,
-            "background_context": background_context
-        }
+        "context_data": {**asdict(context), "background_context": background_context}
     }
 
 async def generate_selected_outcomes_only(
@@ -550,124 +678,73 @@ async def generate_selected_outcomes_only(
     print(f"🎯 Starting selective POV generation - Step 2: Details for {len(selected_titles)} selected outcomes...")
     
     # --- Step 0: Retrieve Stored Context (No re-gathering!) ---
-    print("📊 Retrieving stored context data...")
-    from database import get_context_data
-    
-    try:
-        stored_context = await get_context_data(report_id, user_id)
-        background_context = stored_context["background_context"]
-        print("✅ Using stored context data (no re-gathering needed)")
-    except Exception as context_error:
-        print(f"⚠️ Could not retrieve stored context: {context_error}")
-        print("📊 Falling back to re-gathering context...")
-        
-        # Fallback to re-gathering if stored context not available
-        tasks = [
-            process_research(vendor_url, "vendor"),
-            process_research(target_customer_url, "customer")
-        ]
-        vendor_research_idx = 0
-        customer_research_idx = 1
-        vendor_files_start_idx = 2
-        if vendor_files:
-            tasks.extend([process_file_content(f) for f in vendor_files])
-        customer_files_start_idx = len(tasks)
-        if customer_files:
-            tasks.extend([process_file_content(f) for f in customer_files])
-        linkedin_profiles_idx = -1
-        if linkedin_urls:
-            linkedin_profiles_idx = len(tasks)
-            tasks.append(process_linkedin_profiles(linkedin_urls))
-
-        results = await asyncio.gather(*tasks)
-
-        vendor_research = None
-        customer_research = None
-        vendor_file_content = []
-        customer_file_content = []
-        linkedin_profiles_data = None
-
-        for i, result in enumerate(results):
-            if result["status"] == "success":
-                if i == vendor_research_idx:
-                    vendor_research = result["data"]
-                elif i == customer_research_idx:
-                    customer_research = result["data"]
-                elif vendor_files_start_idx <= i < customer_files_start_idx:
-                    vendor_file_content.append(result["data"])
-                elif customer_files_start_idx <= i < (linkedin_profiles_idx if linkedin_profiles_idx != -1 else len(tasks)):
-                    customer_file_content.append(result["data"])
-                elif i == linkedin_profiles_idx:
-                    linkedin_profiles_data = result["data"]
-            elif result["status"] == "error":
-                 print(f"⚠️ Context gathering task {i} failed: {result.get('reason', 'Unknown error')}")
-
-        # Build enhanced context including Grok research if available
-        grok_context = ""
-        if grok_research and grok_research.get("pov_context_block"):
-            grok_context = f"\n\nGrok Enhanced Research:\n{grok_research['pov_context_block']}"
-
-        background_context = f"""
-vendor_name: {vendor_name}
-vendor_url: {vendor_url}
-vendor_services: {vendor_services}
-target_customer_name: {target_customer_name}
-target_customer_url: {target_customer_url}
-roles_sold_to: {roles_sold_to}
-linkedin_urls: {linkedin_urls}
-role_names: {role_names}
-role_context: {role_context}
-additional_context: {additional_context}
-
-Vendor Research: {json.dumps(vendor_research, indent=2) if vendor_research else "Not available"}
-Customer Research: {json.dumps(customer_research, indent=2) if customer_research else "Not available"}
-
-Vendor Document Analysis: {json.dumps(vendor_file_content, indent=2) if vendor_file_content else "No documents provided"}
-Customer Document Analysis: {json.dumps(customer_file_content, indent=2) if customer_file_content else "No documents provided"}
-
-LinkedIn Profiles Analysis: {linkedin_profiles_data if linkedin_profiles_data else "Not available or not requested"}{grok_context}
-"""
+    # Grok research can be attached after Step 1, so it is added here rather than stored with the context
+    cache_key = (report_id, user_id, content_hash(_build_grok_block(grok_research)))
+    background_context = _background_contexts.get(cache_key)
+    if background_context is not None:
+        _background_contexts.move_to_end(cache_key)
+        print("✅ Using cached background context")
+    else:
+        print("📊 Retrieving stored context data...")
+        from database import get_context_data
 
-    # --- Step 2: Generate Details for Selected Outcomes Only ---
-    print(f"🔍 Generating details for {len(selected_titles)} selected outcomes...")
-    detail_prompts = []
-    for title_data in selected_titles:
-        detail_prompts.append(
-            generate_single_outcome_detail_prompt(
-                background_context, title_data['title'], vendor_name, target_customer_name, role_names
+        try:
+            context = ContextBundle.from_context_data(await get_context_data(report_id, user_id))
+            print("✅ Using stored context data (no re-gathering needed)")
+        except Exception as context_error:
+            print(f"⚠️ Could not retrieve stored context: {context_error}")
+            print("📊 Falling back to re-gathering context...")
+
+            # Fallback to re-gathering if stored context not available
+            context = await gather_context(
+                vendor_url, target_customer_url, vendor_files, customer_files, linkedin_urls
             )
+
+        background_context = build_background_context(
+            context,
+            grok_research,
+            vendor_name=vendor_name,
+            vendor_url=vendor_url,
+            vendor_services=vendor_services,
+            target_customer_name=target_customer_name,
+            target_customer_url=target_customer_url,
+            roles_sold_to=roles_sold_to,
+            linkedin_urls=linkedin_urls,
+            role_names=role_names,
+            role_context=role_context,
+            additional_context=additional_context
         )
-    
+        _background_contexts[cache_key] = background_context
+        while len(_background_contexts) > MAX_CACHED_BACKGROUND_CONTEXTS:
+            _background_contexts.popitem(last=False)
+
+    # The summary only depends on the background context, so it runs alongside the details
+    summary_task = asyncio.create_task(generate_summary_takeaways(
+        background_context, vendor_name, target_customer_name, role_names, model_name,
+        len(selected_titles), "Selected Outcomes"
+    ))
+
+    # --- Step 2: Generate Details for Selected Outcomes Only ---
+    print(f"🔍 Generating details for {len(selected_titles)} selected outcomes...")
     outcome_details_markdown = []
     try:
-        # Run the selected detail prompts in parallel
-        outcome_details_markdown, _ = await llm_call(instructions=detail_prompts, model=model_name)
+        # Run the batched detail prompts for the selected outcomes in parallel
+        outcome_details_markdown = await generate_outcome_details(
+            background_context, [title_data['title'] for title_data in selected_titles],
+            vendor_name, target_customer_name, role_names, model_name
+        )
         if len(outcome_details_markdown) != len(selected_titles):
              print(f"⚠️ Warning: Mismatch between requested ({len(selected_titles)}) and received ({len(outcome_details_markdown)}) outcome details.")
 
     except Exception as e:
         print(f"❌ Error generating outcome details in parallel: {e}")
+        summary_task.cancel()
         raise Exception(f"Failed during parallel generation of outcome details: {e}")
     
     print("✅ Finished generating outcome details.")
 
-    # --- Step 3: Generate Summary & Takeaways ---
-    print("📝 Generating summary and takeaways...")
-    summary_takeaways_markdown = ""
-    try:
-        summary_prompt = generate_summary_takeaways_prompt(
-            background_context, vendor_name, target_customer_name, role_names, len(selected_titles)
-        )
-        summary_responses, _ = await llm_call(instructions=[summary_prompt], model=model_name)
-        if summary_responses:
-            summary_takeaways_markdown = summary_responses[0]
-        else:
-            print("⚠️ Warning: LLM did not return summary/takeaways content.")
-            summary_takeaways_markdown = f"\n## **Summary & Strategic Integration of All {len(selected_titles)} Selected Outcomes**\n\n*Error: Failed to generate Summary & Strategic Integration.*\n\n---\n\n## **Key Takeaways & Next Steps**\n\n*Error: Failed to generate Key Takeaways & Next Steps.*"
-    except Exception as e:
-        print(f"❌ Error generating summary and takeaways: {e}")
-        summary_takeaways_markdown = f"\n## **Summary & Strategic Integration of All {len(selected_titles)} Selected Outcomes**\n\n*Error generating Summary & Strategic Integration: {e}*\n\n---\n\n## **Key Takeaways & Next Steps**\n\n*Error generating Key Takeaways & Next Steps: {e}*"
-    
+    # --- Step 3: Collect Summary & Takeaways (started alongside Step 2) ---
+    summary_takeaways_markdown = await summary_task
     print("✅ Finished generating summary and takeaways.")
     
     return {
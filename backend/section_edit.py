@@ -0,0 +1,149 @@
+"""
+Section-scoped editing for long markdown documents.
+
+Only the "## " sections most relevant to an edit request are sent to the LLM
+verbatim; the rest are reduced to one-line placeholders and the edited
+sections are patched back into the original document afterwards.
+
+Documents too long to rewrite cheaply can instead be edited with find/replace
+patches (PATCH_EDIT_INSTRUCTIONS / apply_replacements).
+"""
+import asyncio
+import json
+import re
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+import numpy as np
+from llm_cache import content_hash, embed_texts, normalize_request
+
+# Shorter documents are cheap enough to send whole
+MIN_CONTENT_CHARS = 6000
+MIN_SECTIONS = 4
+TOP_K_SECTIONS = 2
+MAX_CACHED_SECTION_EMBEDDINGS = 2000
+# Above this many tokens, ask for find/replace patches instead of the full rewritten document
+PATCH_EDIT_MIN_TOKENS = 4000
+
+PATCH_EDIT_INSTRUCTIONS = """
+Do not return the full document. Return only a JSON object describing the changes:
+{"edits": [{"replace": "<exact text copied from the current content>", "with": "<replacement text>"}]}
+Each "replace" value must appear verbatim in the current content and be long enough to be unique.
+"""
+
+# Requests that clearly apply to the whole document are never scoped
+GLOBAL_EDIT_HINTS = (
+    "whole", "entire", "all sections", "throughout", "overall", "everything",
+    "tone", "shorter", "longer", "shorten", "lengthen", "rewrite", "translate",
+    "consistent", "format",
+)
+
+_GLOBAL_EDIT_RE = re.compile(
+    r"\b(?:" + "|".join(re.escape(hint).replace(r"\ ", r"\s+") for hint in GLOBAL_EDIT_HINTS) + r")\b"
+)
+_SECTION_SPLIT_RE = re.compile(r"(?m)^(?=##\s)")
+_SECTION_MARKER_RE = re.compile(r"(?m)^<<<SECTION (\d+)>>>[ \t]*\n?")
+
+# Section embeddings keyed by content hash, so unchanged sections are embedded once
+_section_embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+
+def split_sections(content: str) -> List[str]:
+    """Split markdown into chunks starting at each "## " heading; "".join() restores the original"""
+    return [section for section in _SECTION_SPLIT_RE.split(content) if section]
+
+
+async def _embed_sections(sections: List[str]) -> np.ndarray:
+    keys = [content_hash(section) for section in sections]
+    missing = [i for i, key in enumerate(keys) if key not in _section_embeddings]
+    if missing:
+        vectors = await embed_texts([sections[i][:8000] for i in missing])
+        for i, vector in zip(missing, vectors):
+            _section_embeddings[keys[i]] = vector
+        while len(_section_embeddings) > MAX_CACHED_SECTION_EMBEDDINGS:
+            _section_embeddings.popitem(last=False)
+    return np.stack([_section_embeddings[key] for key in keys])
+
+
+async def select_sections(content: str, edit_request: str, top_k: int = TOP_K_SECTIONS) -> Optional[Tuple[List[str], List[int]]]:
+    """
+    Pick the sections an edit request is about.
+    Returns (sections, selected indices), or None when the whole document should be sent.
+    """
+    if len(content) < MIN_CONTENT_CHARS:
+        return None
+
+    normalized = normalize_request(edit_request)
+    if _GLOBAL_EDIT_RE.search(normalized):
+        return None
+
+    sections = split_sections(content)
+    if len(sections) < MIN_SECTIONS:
+        return None
+
+    try:
+        section_vectors, request_vectors = await asyncio.gather(
+            _embed_sections(sections),
+            embed_texts([normalized])
+        )
+    except Exception as e:
+        print(f"⚠️ Section selection unavailable, sending full document: {e}")
+        return None
+
+    similarities = section_vectors @ request_vectors[0]
+    selected = sorted(np.argsort(similarities)[::-1][:top_k].tolist())
+    return sections, selected
+
+
+def build_sections_prompt(sections: List[str], selected: List[int]) -> str:
+    """Render selected sections verbatim behind markers and the rest as one-line placeholders"""
+    parts = []
+    for i, section in enumerate(sections):
+        if i in selected:
+            parts.append(f"<<<SECTION {i}>>>\n{section.strip()}")
+        else:
+            heading = section.strip().splitlines()[0][:120] if section.strip() else ""
+            parts.append(f"[Section {i} omitted: {heading}]")
+    return "\n\n".join(parts)
+
+
+def patch_sections(sections: List[str], selected: List[int], response: str) -> Optional[str]:
+    """
+    Replace the selected sections with their edited versions from the LLM response.
+    Returns None when the response does not contain exactly the selected sections.
+    """
+    pieces = _SECTION_MARKER_RE.split(response)
+    edited = {int(pieces[i]): pieces[i + 1].strip() for i in range(1, len(pieces) - 1, 2)}
+    if set(edited) != set(selected) or not all(edited.values()):
+        return None
+
+    updated = list(sections)
+    for i in selected:
+        # Keep the whitespace that separated this section from the next one
+        trailing = sections[i][len(sections[i].rstrip()):]
+        if not trailing and i < len(sections) - 1:
+            trailing = "\n\n"
+        updated[i] = edited[i] + trailing
+    return "".join(updated)
+
+
+def apply_replacements(content: str, response: str) -> Optional[str]:
+    """
+    Apply a PATCH_EDIT_INSTRUCTIONS JSON response to content.
+    Returns None when the response is malformed or a "replace" text is not found exactly once.
+    """
+    try:
+        edits = json.loads(response)["edits"]
+    except (ValueError, KeyError, TypeError):
+        return None
+    if not isinstance(edits, list) or not edits:
+        return None
+
+    updated = content
+    for edit in edits:
+        if not isinstance(edit, dict):
+            return None
+        old, new = edit.get("replace"), edit.get("with")
+        if not isinstance(old, str) or not isinstance(new, str) or not old or updated.count(old) != 1:
+            return None
+        updated = updated.replace(old, new, 1)
+    return updated
@@ -0,0 +1,14 @@
+-- Composite lookup indexes for generated artifacts
+-- Edit, version and restore endpoints always filter by (id, user_id)
+
+CREATE INDEX IF NOT EXISTS idx_whitepapers_id_user_id
+ON public.whitepapers (id, user_id);
+
+CREATE INDEX IF NOT EXISTS idx_marketing_assets_id_user_id
+ON public.marketing_assets (id, user_id);
+
+-- To check if indexes were created successfully:
+SELECT indexname, tablename
+FROM pg_indexes
+WHERE schemaname = 'public'
+AND indexname IN ('idx_whitepapers_id_user_id', 'idx_marketing_assets_id_user_id');
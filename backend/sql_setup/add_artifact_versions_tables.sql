@@ -0,0 +1,87 @@
+-- Move whitepaper and marketing asset version history into dedicated tables
+-- Each edit inserts a single version row instead of rewriting the whole
+-- version_history JSONB array on the parent row
+
+-- ===============================
+-- WHITEPAPER VERSIONS
+-- ===============================
+
+CREATE TABLE IF NOT EXISTS public.whitepaper_versions (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    whitepaper_id UUID NOT NULL REFERENCES public.whitepapers(id) ON DELETE CASCADE,
+    version INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    title TEXT,
+    edited_at TIMESTAMPTZ DEFAULT NOW(),
+    edit_message TEXT,
+    edited_by UUID,
+    UNIQUE (whitepaper_id, version)
+);
+
+CREATE INDEX IF NOT EXISTS idx_whitepaper_versions_whitepaper_version
+ON public.whitepaper_versions (whitepaper_id, version DESC);
+
+-- Backfill existing history from the JSONB column
+INSERT INTO public.whitepaper_versions (whitepaper_id, version, content, title, edited_at, edit_message, edited_by)
+SELECT
+    w.id,
+    (v->>'version')::INTEGER,
+    v->>'content',
+    v->>'title',
+    COALESCE((v->>'edited_at')::TIMESTAMPTZ, w.created_at),
+    v->>'edit_message',
+    NULLIF(v->>'edited_by', '')::UUID
+FROM public.whitepapers w
+CROSS JOIN LATERAL jsonb_array_elements(COALESCE(w.version_history, '[]'::jsonb)) AS v
+WHERE v->>'content' IS NOT NULL
+ON CONFLICT (whitepaper_id, version) DO NOTHING;
+
+DROP INDEX IF EXISTS public.idx_whitepapers_version_history;
+ALTER TABLE public.whitepapers DROP COLUMN IF EXISTS version_history;
+
+-- ===============================
+-- MARKETING ASSET VERSIONS
+-- ===============================
+
+CREATE TABLE IF NOT EXISTS public.marketing_asset_versions (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    asset_id UUID NOT NULL REFERENCES public.marketing_assets(id) ON DELETE CASCADE,
+    version INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    title TEXT,
+    edited_at TIMESTAMPTZ DEFAULT NOW(),
+    edit_message TEXT,
+    edited_by UUID,
+    UNIQUE (asset_id, version)
+);
+
+CREATE INDEX IF NOT EXISTS idx_marketing_asset_versions_asset_version
+ON public.marketing_asset_versions (asset_id, version DESC);
+
+-- Backfill existing history from the JSONB column
+INSERT INTO public.marketing_asset_versions (asset_id, version, content, title, edited_at, edit_message, edited_by)
+SELECT
+    a.id,
+    (v->>'version')::INTEGER,
+    v->>'content',
+    v->>'title',
+    COALESCE((v->>'edited_at')::TIMESTAMPTZ, a.created_at),
+    v->>'edit_message',
+    NULLIF(v->>'edited_by', '')::UUID
+FROM public.marketing_assets a
+CROSS JOIN LATERAL jsonb_array_elements(COALESCE(a.version_history, '[]'::jsonb)) AS v
+WHERE v->>'content' IS NOT NULL
+ON CONFLICT (asset_id, version) DO NOTHING;
+
+DROP INDEX IF EXISTS public.idx_marketing_assets_version_history;
+ALTER TABLE public.marketing_assets DROP COLUMN IF EXISTS version_history;
+
+-- ===============================
+-- VERIFICATION
+-- ===============================
+
+-- Check if tables were created successfully:
+SELECT table_name
+FROM information_schema.tables
+WHERE table_schema = 'public'
+AND table_name IN ('whitepaper_versions', 'marketing_asset_versions');
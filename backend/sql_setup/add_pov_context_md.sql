@@ -0,0 +1,11 @@
+-- Add a materialized markdown context block to pov_reports
+-- Built once when outcome titles are saved and reused as a stable prompt prefix
+-- by the whitepaper and marketing asset generators
+
+ALTER TABLE pov_reports ADD COLUMN IF NOT EXISTS pov_context_md TEXT;
+
+-- To check if the column was added successfully:
+SELECT column_name, data_type
+FROM information_schema.columns
+WHERE table_name = 'pov_reports'
+AND column_name = 'pov_context_md';
@@ -0,0 +1,43 @@
+-- Aggregate helpers for the super-admin report counter sync (POST /admin/sync-report-counters)
+-- Lets the backend find and fix drifted counters in two round trips
+-- instead of one count query per user
+
+-- Superseded by report_counter_diffs(); drop it where an earlier version of this script created it
+DROP FUNCTION IF EXISTS public.get_report_counts_by_user();
+
+-- Only the profiles whose stored counter disagrees with their actual report count
+CREATE OR REPLACE FUNCTION public.report_counter_diffs()
+RETURNS TABLE (id UUID, email TEXT, stored INTEGER, actual BIGINT) AS $$
+    SELECT p.id, p.email, p.reports_generated_total, COALESCE(c.cnt, 0)
+    FROM public.profiles p
+    LEFT JOIN (
+        SELECT r.user_id, COUNT(*) AS cnt
+        FROM public.pov_reports r
+        GROUP BY r.user_id
+    ) c ON c.user_id = p.id
+    WHERE COALESCE(p.reports_generated_total, 0) <> COALESCE(c.cnt, 0);
+$$ LANGUAGE sql STABLE;
+
+-- Apply a batch of corrected counters in a single UPDATE ... FROM statement
+-- counters: [{"id": "<profile uuid>", "reports_generated_total": <int>}, ...]
+CREATE OR REPLACE FUNCTION public.set_report_counters(counters JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+    updated_count INTEGER;
+BEGIN
+    UPDATE public.profiles p
+    SET reports_generated_total = c.reports_generated_total,
+        updated_at = NOW()
+    FROM jsonb_to_recordset(counters) AS c(id UUID, reports_generated_total INTEGER)
+    WHERE p.id = c.id;
+
+    GET DIAGNOSTICS updated_count = ROW_COUNT;
+    RETURN updated_count;
+END;
+$$ LANGUAGE plpgsql;
+
+-- To check if the functions were created successfully:
+SELECT routine_name
+FROM information_schema.routines
+WHERE routine_schema = 'public'
+AND routine_name IN ('report_counter_diffs', 'set_report_counters');
@@ -0,0 +1,17 @@
+-- Indexes for the sales script list and report counter queries
+-- GET /sales-scripts/{report_id} (and /report/{report_id}/assets) filter by
+-- (report_id, user_id) and order by created_at DESC; the report counter sync
+-- groups pov_reports by user_id
+
+CREATE INDEX IF NOT EXISTS idx_sales_scripts_report_user_created
+ON public.sales_scripts (report_id, user_id, created_at DESC);
+
+-- Already created by create_all_tables.sql; repeated for databases set up before it
+CREATE INDEX IF NOT EXISTS idx_pov_reports_user_id
+ON public.pov_reports (user_id);
+
+-- To check if indexes were created successfully:
+SELECT indexname, tablename
+FROM pg_indexes
+WHERE schemaname = 'public'
+AND indexname IN ('idx_sales_scripts_report_user_created', 'idx_pov_reports_user_id');
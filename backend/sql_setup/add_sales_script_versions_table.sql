@@ -0,0 +1,50 @@
+-- Move sales script version history into a dedicated table
+-- Same layout as whitepaper_versions / marketing_asset_versions
+-- (see add_artifact_versions_tables.sql): each edit inserts one version row
+-- instead of rewriting the whole version_history JSONB array
+
+CREATE TABLE IF NOT EXISTS public.sales_script_versions (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    script_id UUID NOT NULL REFERENCES public.sales_scripts(id) ON DELETE CASCADE,
+    version INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    title TEXT,
+    edited_at TIMESTAMPTZ DEFAULT NOW(),
+    edit_message TEXT,
+    edited_by UUID,
+    UNIQUE (script_id, version)
+);
+
+CREATE INDEX IF NOT EXISTS idx_sales_script_versions_script_version
+ON public.sales_script_versions (script_id, version DESC);
+
+-- Backfill existing history from the JSONB column
+INSERT INTO public.sales_script_versions (script_id, version, content, title, edited_at, edit_message, edited_by)
+SELECT
+    s.id,
+    (v->>'version')::INTEGER,
+    v->>'content',
+    v->>'title',
+    COALESCE((v->>'edited_at')::TIMESTAMPTZ, s.created_at),
+    v->>'edit_message',
+    NULLIF(v->>'edited_by', '')::UUID
+FROM public.sales_scripts s
+CROSS JOIN LATERAL jsonb_array_elements(COALESCE(s.version_history, '[]'::jsonb)) AS v
+WHERE v->>'content' IS NOT NULL
+ON CONFLICT (script_id, version) DO NOTHING;
+
+DROP INDEX IF EXISTS public.idx_sales_scripts_version_history;
+ALTER TABLE public.sales_scripts DROP COLUMN IF EXISTS version_history;
+
+-- Keep the newest 20 versions per script (trim_artifact_versions() is defined in add_version_trim_triggers.sql)
+DROP TRIGGER IF EXISTS trigger_trim_sales_script_versions ON public.sales_script_versions;
+CREATE TRIGGER trigger_trim_sales_script_versions
+    AFTER INSERT ON public.sales_script_versions
+    FOR EACH ROW
+    EXECUTE FUNCTION public.trim_artifact_versions('script_id', '20');
+
+-- To check if the table and trigger were created successfully:
+SELECT table_name
+FROM information_schema.tables
+WHERE table_schema = 'public'
+AND table_name = 'sales_script_versions';
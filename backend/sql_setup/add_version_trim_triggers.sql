@@ -0,0 +1,36 @@
+-- Cap stored artifact versions in the database instead of the API
+-- Keeps the newest 20 versions per artifact; runs after every version insert
+
+CREATE OR REPLACE FUNCTION public.trim_artifact_versions()
+RETURNS TRIGGER AS $$
+DECLARE
+    -- TG_ARGV[0]: parent foreign key column, TG_ARGV[1]: versions to keep
+    fk_column TEXT := TG_ARGV[0];
+    keep_count INTEGER := COALESCE(TG_ARGV[1]::INTEGER, 20);
+    parent_id UUID;
+BEGIN
+    EXECUTE format('SELECT ($1).%I', fk_column) INTO parent_id USING NEW;
+    EXECUTE format(
+        'DELETE FROM %I.%I WHERE %I = $1 AND version <= $2 - $3',
+        TG_TABLE_SCHEMA, TG_TABLE_NAME, fk_column
+    ) USING parent_id, NEW.version, keep_count;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_trim_whitepaper_versions ON public.whitepaper_versions;
+CREATE TRIGGER trigger_trim_whitepaper_versions
+    AFTER INSERT ON public.whitepaper_versions
+    FOR EACH ROW
+    EXECUTE FUNCTION public.trim_artifact_versions('whitepaper_id', '20');
+
+DROP TRIGGER IF EXISTS trigger_trim_marketing_asset_versions ON public.marketing_asset_versions;
+CREATE TRIGGER trigger_trim_marketing_asset_versions
+    AFTER INSERT ON public.marketing_asset_versions
+    FOR EACH ROW
+    EXECUTE FUNCTION public.trim_artifact_versions('asset_id', '20');
+
+-- To check if triggers were created successfully:
+SELECT trigger_name, event_object_table
+FROM information_schema.triggers
+WHERE trigger_name IN ('trigger_trim_whitepaper_versions', 'trigger_trim_marketing_asset_versions');
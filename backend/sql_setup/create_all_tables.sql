@@ -21,7 +21,8 @@ CREATE TABLE IF NOT EXISTS pov_reports (
     status TEXT NOT NULL DEFAULT 'processing',
     created_at TIMESTAMPTZ DEFAULT NOW(),
     updated_at TIMESTAMPTZ DEFAULT NOW(),
-    context_data JSONB
+    context_data JSONB,
+    pov_context_md TEXT
 );
 
 -- Add status constraint
@@ -0,0 +1,165 @@
+"""
+Version bookkeeping for chat-editable artifacts whose history lives in a
+dedicated <artifact>_versions table (see sql_setup/add_artifact_versions_tables.sql)
+"""
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from fastapi import BackgroundTasks, HTTPException
+from database import get_async_supabase
+
+# Number of previous versions kept per artifact (enforced by the trim trigger)
+MAX_VERSIONS = 20
+
+
+class VersionedTable:
+    """
+    Edit, list and restore versions of rows in an artifact table.
+
+    Every change snapshots the current content as version N in the versions
+    table and writes the new content to the row as version N + 1.
+    """
+
+    def __init__(self, table_name: str, versions_table: str, foreign_key: str, label: str,
+                 content_field: str = "content", title_field: str = "title"):
+        self.table_name = table_name
+        self.versions_table = versions_table
+        self.foreign_key = foreign_key
+        self.label = label
+        self.content_field = content_field
+        self.title_field = title_field
+
+    async def get(self, row_id: str, user_id: str, columns: str = "*") -> Dict:
+        """
+        Fetch a row owned by the user
+        """
+        db = await get_async_supabase()
+        result = await db.table(self.table_name).select(columns).eq("id", row_id).eq("user_id", user_id).single().execute()
+        if not result.data:
+            raise HTTPException(status_code=404, detail=f"{self.label} not found")
+        return result.data
+
+    async def _snapshot(self, row: Dict, row_id: str, user_id: str, edit_message: str, now: str) -> None:
+        """
+        Store the row's current content as its current version number
+        """
+        db = await get_async_supabase()
+        await db.table(self.versions_table).upsert({
+            self.foreign_key: row_id,
+            "version": row.get("current_version", 1),
+            "content": row[self.content_field],
+            "title": row.get(self.title_field),
+            "edited_at": row.get("updated_at") or row.get("created_at") or now,
+            "edit_message": edit_message,
+            "edited_by": user_id
+        }, on_conflict=f"{self.foreign_key},version", ignore_duplicates=True).execute()
+
+    async def _snapshot_in_background(self, row: Dict, row_id: str, user_id: str, edit_message: str, now: str) -> None:
+        """
+        _snapshot() for use as a background task - failures are logged instead of raised
+        """
+        try:
+            await self._snapshot(row, row_id, user_id, edit_message, now)
+        except Exception as e:
+            print(f"❌ Failed to store {self.label.lower()} {row_id} version {row.get('current_version', 1)}: {e}")
+
+    async def _save(self, row: Dict, row_id: str, user_id: str, updates: Dict, edit_message: str,
+                    background_tasks: Optional[BackgroundTasks] = None) -> int:
+        """
+        Snapshot the row's current content and apply updates. Versions beyond
+        MAX_VERSIONS are trimmed by a database trigger (sql_setup/add_version_trim_triggers.sql).
+        With background_tasks the snapshot is written after the response is sent;
+        the guarded row update is always awaited so conflicts still surface as a 409.
+        Returns the new version number.
+        """
+        db = await get_async_supabase()
+        now = datetime.now(timezone.utc).isoformat()
+        current_version_num = row.get("current_version", 1)
+
+        if background_tasks is None:
+            await self._snapshot(row, row_id, user_id, edit_message, now)
+
+        # Guarding on current_version makes a replayed or concurrent write a no-op instead of a double bump
+        update_result = await db.table(self.table_name).update({
+            **updates,
+            "current_version": current_version_num + 1,
+            "updated_at": now
+        }).eq("id", row_id).eq("user_id", user_id).eq("current_version", current_version_num).execute()
+        if not update_result.data:
+            raise HTTPException(status_code=409, detail=f"{self.label} was modified concurrently, please retry")
+
+        if background_tasks is not None:
+            # The upsert ignores duplicates, so a replayed snapshot is harmless
+            background_tasks.add_task(self._snapshot_in_background, row, row_id, user_id, edit_message, now)
+        return current_version_num + 1
+
+    async def edit(self, row: Dict, row_id: str, user_id: str, new_content: str, edit_request: str,
+                   background_tasks: Optional[BackgroundTasks] = None) -> int:
+        """
+        Replace the row's content with new_content, keeping the previous content as a version
+        """
+        edit_message = "Original version" if row.get("current_version", 1) == 1 else f"Before edit: {edit_request}"
+        return await self._save(row, row_id, user_id, {self.content_field: new_content}, edit_message, background_tasks)
+
+    async def list_versions(self, row_id: str, user_id: str) -> Dict:
+        """
+        Return the current version number, title and metadata of the stored versions (oldest first).
+        Content is left out - it is loaded per version with get_version_content().
+        """
+        db = await get_async_supabase()
+        row, versions_result = await asyncio.gather(
+            self.get(row_id, user_id, f"current_version, {self.title_field}"),
+            db.table(self.versions_table).select("version, title, edited_at, edit_message, edited_by").eq(self.foreign_key, row_id).order("version", desc=True).limit(MAX_VERSIONS).execute()
+        )
+        return {
+            "current_version": row.get("current_version", 1),
+            "current_title": row.get(self.title_field, ""),
+            "versions": list(reversed(versions_result.data or []))
+        }
+
+    async def get_version(self, row_id: str, version_number: int) -> Optional[Dict]:
+        """
+        Look up a single stored version (indexed on foreign key, version)
+        """
+        db = await get_async_supabase()
+        result = await db.table(self.versions_table).select("content, title").eq(self.foreign_key, row_id).eq("version", version_number).limit(1).execute()
+        return result.data[0] if result.data else None
+
+    async def get_version_content(self, row_id: str, user_id: str, version_number: int) -> Dict:
+        """
+        Return one stored version's content, checking the row belongs to the user
+        """
+        _, version = await asyncio.gather(
+            self.get(row_id, user_id, "id"),
+            self.get_version(row_id, version_number)
+        )
+        if not version:
+            raise HTTPException(status_code=404, detail=f"Version {version_number} not found")
+        return {"version": version_number, **version}
+
+    async def restore(self, row_id: str, user_id: str, version_number: int) -> Dict:
+        """
+        Make a stored version the current content again
+        """
+        row, version_to_restore = await asyncio.gather(
+            self.get(row_id, user_id, f"{self.content_field}, {self.title_field}, current_version, updated_at, created_at"),
+            self.get_version(row_id, version_number)
+        )
+        if not version_to_restore:
+            raise HTTPException(status_code=404, detail=f"Version {version_number} not found")
+
+        new_version = await self._save(row, row_id, user_id, {
+            self.content_field: version_to_restore["content"],
+            self.title_field: version_to_restore.get("title") or row.get(self.title_field)
+        }, f"Before restoring to version {version_number}")
+
+        return {
+            "message": f"Successfully restored version {version_number}",
+            "restored_content": version_to_restore["content"],
+            "new_version": new_version
+        }
+
+
+whitepapers = VersionedTable("whitepapers", "whitepaper_versions", "whitepaper_id", "Whitepaper")
+marketing_assets = VersionedTable("marketing_assets", "marketing_asset_versions", "asset_id", "Marketing asset")
+sales_scripts = VersionedTable("sales_scripts", "sales_script_versions", "script_id", "Sales script", content_field="script_body")
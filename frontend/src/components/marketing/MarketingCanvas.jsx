@@ -184,6 +184,7 @@ const MarketingCanvas = () => {
       // Call backend chat endpoint
       const response = await apiService.chatEditMarketingAsset(currentAssetId, {
         user_id: user.id,
+        report_id: currentReportId,
         message: message,
         current_content: assetContent
       });
@@ -192,9 +193,9 @@ const MarketingCanvas = () => {
       if (response.version) {
         setCurrentVersion(response.version);
       }
-      if (response.version_history) {
-        setVersionHistory(response.version_history);
-      }
+      // Version history is stored server-side, so refresh it after the edit
+      const versionsData = await apiService.getMarketingAssetVersions(currentAssetId, user.id);
+      setVersionHistory(versionsData.versions || []);
       
       // Add AI response message before streaming starts
       const aiResponse = { 
@@ -259,11 +260,24 @@ const MarketingCanvas = () => {
     }
   };
 
-  const viewVersion = (version) => {
+  const viewVersion = async (version) => {
     if (version) {
+      // The version list only carries metadata, so load content on demand
       setViewingVersion(version.version);
-      setAssetContent(version.content);
       setAssetTitle(version.title || assetTitle);
+      let content = version.content;
+      if (content === undefined) {
+        try {
+          const data = await apiService.getMarketingAssetVersionContent(currentAssetId, version.version, user.id);
+          content = data.content;
+          setVersionHistory(prev => prev.map(v => v.version === version.version ? { ...v, content } : v));
+        } catch (err) {
+          console.error('Error loading version content:', err);
+          toast.error('Failed to load version');
+          return;
+        }
+      }
+      setAssetContent(content);
     } else {
       setViewingVersion(null);
       setAssetContent(originalContent);
@@ -311,6 +325,7 @@ const MarketingCanvas = () => {
       // Use the chat edit endpoint with a generic "Direct edit" message
       const response = await apiService.chatEditMarketingAsset(currentAssetId, {
         user_id: user.id,
+        report_id: currentReportId,
         message: "Direct edit via inline editor",
         current_content: newContent
       });
@@ -319,9 +334,9 @@ const MarketingCanvas = () => {
       if (response.version) {
         setCurrentVersion(response.version);
       }
-      if (response.version_history) {
-        setVersionHistory(response.version_history);
-      }
+      // Version history is stored server-side, so refresh it after the edit
+      const versionsData = await apiService.getMarketingAssetVersions(currentAssetId, user.id);
+      setVersionHistory(versionsData.versions || []);
 
       // Update the content states
       setAssetContent(newContent);
@@ -69,6 +69,18 @@ const SalesScriptsCanvas = () => {
     loadInitialData();
   }, [currentReportId, user?.id]);
 
+  // Version history is only fetched while the history panel is open (and refreshed when the version changes)
+  useEffect(() => {
+    if (!showVersionHistory || !currentScriptId || !user?.id) return;
+    let cancelled = false;
+    apiService.getSalesScriptVersions(currentScriptId, user.id)
+      .then(versionsData => {
+        if (!cancelled) setVersionHistory(versionsData.versions || []);
+      })
+      .catch(err => console.error('Error loading version history:', err));
+    return () => { cancelled = true; };
+  }, [showVersionHistory, currentScriptId, currentVersion, user?.id]);
+
   const loadInitialData = async () => {
     if (!currentReportId || !user?.id) return;
     
@@ -214,6 +226,7 @@ const SalesScriptsCanvas = () => {
       // Call backend chat endpoint
       const response = await apiService.chatEditSalesScript(currentScriptId, {
         user_id: user.id,
+        report_id: currentReportId,
         message: message,
         current_content: scriptContent
       });
@@ -222,10 +235,6 @@ const SalesScriptsCanvas = () => {
       if (response.version) {
         setCurrentVersion(response.version);
       }
-      if (response.version_history) {
-        setVersionHistory(response.version_history);
-      }
-      
       // Add AI response message before streaming starts
       const aiResponse = { 
         type: 'ai', 
@@ -276,24 +285,28 @@ const SalesScriptsCanvas = () => {
     setChatMessages([]);
     setCurrentVersion(script.current_version || 1);
     setViewingVersion(null);
-    
-    // Load version history if available
-    if (script.id && user?.id) {
-      try {
-        const versionsData = await apiService.getSalesScriptVersions(script.id, user.id);
-        setVersionHistory(versionsData.versions || []);
-        setCurrentVersion(versionsData.current_version || 1);
-      } catch (err) {
-        console.error('Error loading version history:', err);
-      }
-    }
+    // Loaded by the history panel effect when it is opened
+    setVersionHistory([]);
   };
 
-  const viewVersion = (version) => {
+  const viewVersion = async (version) => {
     if (version) {
+      // The version list only carries metadata, so load content on demand
       setViewingVersion(version.version);
-      setScriptContent(version.content || version.script_body);
       setScriptTitle(version.title || scriptTitle);
+      let content = version.content;
+      if (content === undefined) {
+        try {
+          const data = await apiService.getSalesScriptVersionContent(currentScriptId, version.version, user.id);
+          content = data.content;
+          setVersionHistory(prev => prev.map(v => v.version === version.version ? { ...v, content } : v));
+        } catch (err) {
+          console.error('Error loading version content:', err);
+          toast.error('Failed to load version');
+          return;
+        }
+      }
+      setScriptContent(content);
     } else {
       setViewingVersion(null);
       setScriptContent(originalContent);
@@ -311,9 +324,6 @@ const SalesScriptsCanvas = () => {
       setCurrentVersion(response.new_version);
       setViewingVersion(null);
       
-      const versionsData = await apiService.getSalesScriptVersions(currentScriptId, user.id);
-      setVersionHistory(versionsData.versions || []);
-      
       toast.success(`Version ${versionNumber} is now the current version`);
     } catch (err) {
       toast.error('Failed to restore version');
@@ -341,6 +351,7 @@ const SalesScriptsCanvas = () => {
       // Use the chat edit endpoint with a generic "Direct edit" message
       const response = await apiService.chatEditSalesScript(currentScriptId, {
         user_id: user.id,
+        report_id: currentReportId,
         message: "Direct edit via inline editor",
         current_content: newContent
       });
@@ -349,9 +360,6 @@ const SalesScriptsCanvas = () => {
       if (response.version) {
         setCurrentVersion(response.version);
       }
-      if (response.version_history) {
-        setVersionHistory(response.version_history);
-      }
 
       // Update the content states
       setScriptContent(newContent);
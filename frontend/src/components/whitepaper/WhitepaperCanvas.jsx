@@ -179,6 +179,7 @@ const WhitepaperCanvas = () => {
       // Call backend chat endpoint
       const response = await apiService.chatEditWhitepaper(currentWhitepaperId, {
         user_id: user.id,
+        report_id: currentReportId,
         message: message,
         current_content: whitepaperContent
       });
@@ -187,9 +188,9 @@ const WhitepaperCanvas = () => {
       if (response.version) {
         setCurrentVersion(response.version);
       }
-      if (response.version_history) {
-        setVersionHistory(response.version_history);
-      }
+      // Version history is stored server-side, so refresh it after the edit
+      const versionsData = await apiService.getWhitepaperVersions(currentWhitepaperId, user.id);
+      setVersionHistory(versionsData.versions || []);
       
       // Add AI response message before streaming starts
       const aiResponse = { 
@@ -255,12 +256,24 @@ const WhitepaperCanvas = () => {
     }
   };
   
-  const viewVersion = (version) => {
+  const viewVersion = async (version) => {
     if (version) {
-      // Viewing a historical version
+      // Viewing a historical version - the version list only carries metadata, so load content on demand
       setViewingVersion(version.version);
-      setWhitepaperContent(version.content);
       setWhitepaperTitle(version.title || whitepaperTitle);
+      let content = version.content;
+      if (content === undefined) {
+        try {
+          const data = await apiService.getWhitepaperVersionContent(currentWhitepaperId, version.version, user.id);
+          content = data.content;
+          setVersionHistory(prev => prev.map(v => v.version === version.version ? { ...v, content } : v));
+        } catch (err) {
+          console.error('Error loading version content:', err);
+          toast.error('Failed to load version');
+          return;
+        }
+      }
+      setWhitepaperContent(content);
     } else {
       // Back to current version
       setViewingVersion(null);
@@ -300,6 +313,7 @@ const WhitepaperCanvas = () => {
       // Use the chat edit endpoint with a generic "Direct edit" message
       const response = await apiService.chatEditWhitepaper(currentWhitepaperId, {
         user_id: user.id,
+        report_id: currentReportId,
         message: "Direct edit via inline editor",
         current_content: newContent
       });
@@ -308,9 +322,9 @@ const WhitepaperCanvas = () => {
       if (response.version) {
         setCurrentVersion(response.version);
       }
-      if (response.version_history) {
-        setVersionHistory(response.version_history);
-      }
+      // Version history is stored server-side, so refresh it after the edit
+      const versionsData = await apiService.getWhitepaperVersions(currentWhitepaperId, user.id);
+      setVersionHistory(versionsData.versions || []);
 
       // Update the content states
       setWhitepaperContent(newContent);
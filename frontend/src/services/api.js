@@ -293,6 +293,12 @@ export const apiService = {
     });
     return response.data;
   },
+  getWhitepaperVersionContent: async (whitepaperId, versionNumber, userId) => {
+    const response = await apiClient.get(`/whitepapers/${whitepaperId}/versions/${versionNumber}/content?user_id=${userId}`, {
+      headers: { 'X-API-Key': API_CONFIG.API_KEY }
+    });
+    return response.data;
+  },
   restoreWhitepaperVersion: async (whitepaperId, versionNumber, userId) => {
     const response = await apiClient.post(`/whitepapers/${whitepaperId}/restore/${versionNumber}`, {
       user_id: userId
@@ -336,6 +342,12 @@ export const apiService = {
     });
     return response.data;
   },
+  getMarketingAssetVersionContent: async (assetId, versionNumber, userId) => {
+    const response = await apiClient.get(`/marketing-assets/${assetId}/versions/${versionNumber}/content?user_id=${userId}`, {
+      headers: { 'X-API-Key': API_CONFIG.API_KEY }
+    });
+    return response.data;
+  },
   restoreMarketingAssetVersion: async (assetId, versionNumber, userId) => {
     const response = await apiClient.post(`/marketing-assets/${assetId}/restore/${versionNumber}`, {
       user_id: userId
@@ -379,6 +391,12 @@ export const apiService = {
     });
     return response.data;
   },
+  getSalesScriptVersionContent: async (scriptId, versionNumber, userId) => {
+    const response = await apiClient.get(`/sales-scripts/${scriptId}/versions/${versionNumber}/content?user_id=${userId}`, {
+      headers: { 'X-API-Key': API_CONFIG.API_KEY }
+    });
+    return response.data;
+  },
   restoreSalesScriptVersion: async (scriptId, versionNumber, userId) => {
     const response = await apiClient.post(`/sales-scripts/${scriptId}/restore/${versionNumber}`, {
       user_id: userId
@@ -391,6 +409,14 @@ export const apiService = {
     return response.data;
   },
 
+  // All generated assets for a report (whitepapers, marketing assets, sales scripts)
+  getReportAssets: async (reportId, userId) => {
+    const response = await apiClient.get(`/report/${reportId}/assets?user_id=${userId}`, {
+      headers: { 'X-API-Key': API_CONFIG.API_KEY }
+    });
+    return response.data;
+  },
+
   // Financial data
   getCompanyFinancialData: async (companyName) => {
     const response = await apiClient.get(`/company/${encodeURIComponent(companyName)}/financial-data`, {